@@ -5,21 +5,38 @@ Main Flask Application
 """
 
 import os
-from flask import Flask, request, jsonify, send_file, send_from_directory, session, redirect, url_for, render_template_string
+import re
+from flask import Flask, request, jsonify, send_file, send_from_directory, session, redirect, url_for, render_template_string, abort
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from werkzeug.exceptions import HTTPException
 from dotenv import load_dotenv
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 import json
+import time
+import queue
+import atexit
 import hashlib
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import TTLCache
 
 from modules.scanner import SecurityScanner
 from modules.report_generator import ReportGenerator
 from modules.email_sender import EmailSender
 from modules.scan_storage import ScanStorage
+from modules.mongodb_storage import MongoDBStorage
 from modules.mpesa_payment import MPesaPayment
 from modules.payment_manager import PaymentManager
 from modules.resend_email import ResendEmail
@@ -28,10 +45,52 @@ from modules.paystack_payment import PaystackPayment
 # Load environment variables
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson (much faster than the stdlib json module)"""
+    
+    def _dump_bytes(self, obj):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+    
+    def dumps(self, obj, **kwargs):
+        return self._dump_bytes(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """Build a jsonify() response straight from orjson's bytes (no str round trip)"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dump_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+class CyberTechFlask(Flask):
+    """Flask app with Cache-Control max-age tuned for the frontend assets"""
+    
+    # Assets are not fingerprinted, so keep the window short enough for deploys to show up
+    STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '300'))
+    
+    def get_send_file_max_age(self, filename):
+        if filename and filename.endswith('.html'):
+            return 0  # always revalidate pages (304 via ETag)
+        if filename and filename.endswith(('.js', '.css')):
+            return self.STATIC_MAX_AGE
+        return super().get_send_file_max_age(filename)
+
+
 # Initialize Flask app
-app = Flask(__name__, static_folder='static', static_url_path='')
+app = CyberTechFlask(__name__, static_folder='static', static_url_path='')
+app.json = OrjsonProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(32))
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size
+# Let a front-end server that supports X-Sendfile stream report downloads
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+# Behind nginx, hand report downloads to an internal location via X-Accel-Redirect
+# (e.g. "/_protected_reports/"; see README)
+app.config['REPORTS_ACCEL_REDIRECT'] = os.getenv('REPORTS_ACCEL_REDIRECT', '')
 
 # Admin credentials (in production, store in environment variables)
 ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
@@ -40,6 +99,27 @@ ADMIN_PASSWORD_HASH = os.getenv('ADMIN_PASSWORD_HASH', hashlib.sha256('CyberTech
 # Enable CORS
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+# Compress JSON/HTML/JS/CSS responses (scan results are large and repetitive)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_LEVEL'] = 5
+app.config['COMPRESS_BR_LEVEL'] = 5
+Compress(app)
+
+# flask-compress appends ":<algorithm>" to the ETag of compressed responses
+_COMPRESSED_ETAG_SUFFIX = re.compile(
+    ':(?:' + '|'.join(map(re.escape, app.config['COMPRESS_ALGORITHM'])) + ')"'
+)
+
+
+@app.before_request
+def strip_compressed_etags():
+    """Drop the compression suffix from If-None-Match so it matches the uncompressed ETag (and 304s work)"""
+    if_none_match = request.environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        request.environ['HTTP_IF_NONE_MATCH'] = _COMPRESSED_ETAG_SUFFIX.sub('"', if_none_match)
+
+
 # Initialize rate limiting
 limiter = Limiter(
     get_remote_address,
@@ -48,31 +128,218 @@ limiter = Limiter(
     storage_uri="memory://",
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('cybertech.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging: once the listener is started, request threads only enqueue
+# records and a listener thread does the file/console writes
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_handlers = [logging.FileHandler('cybertech.log', delay=True), logging.StreamHandler()]
+for log_handler in log_handlers:
+    log_handler.setFormatter(log_formatter)
+
+log_queue = queue.SimpleQueue()
+log_queue_handler = QueueHandler(log_queue)
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+# Until then records are written directly, so the gunicorn master (which imports
+# the app with preload_app) never forks with a listener thread or queued records
+for log_handler in log_handlers:
+    root_logger.addHandler(log_handler)
+log_listener = None
+
+
+def start_log_listener():
+    """Hand log writes to a listener thread (called in each gunicorn worker after fork, or in __main__)"""
+    global log_listener
+    for log_handler in log_handlers:
+        root_logger.removeHandler(log_handler)
+    root_logger.addHandler(log_queue_handler)
+    log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+    log_listener.start()
+
+
+def stop_log_listener():
+    """Write out any queued log records and stop the listener thread"""
+    if log_listener is not None:
+        log_listener.stop()
+
+
+atexit.register(stop_log_listener)
 logger = logging.getLogger(__name__)
 
 # Create reports directory if it doesn't exist
 os.makedirs('reports', exist_ok=True)
 
+# Process-local index of generated PDF reports (scan_id -> report path)
+_report_index = {}
+_report_index_lock = threading.RLock()
+# Scans recently found to have no report, so status polls don't stat the disk every time
+_missing_reports = TTLCache(maxsize=4096, ttl=5)
+
+
+def _warm_report_index():
+    """Populate the report index with the reports already on disk"""
+    with os.scandir('reports') as entries:
+        for entry in entries:
+            if entry.name.startswith('scan_') and entry.name.endswith('.pdf'):
+                _report_index[entry.name[len('scan_'):-len('.pdf')]] = entry.path
+
+
+def find_report(scan_id):
+    """Return the PDF report path for a scan, or None if it has no report"""
+    with _report_index_lock:
+        report_path = _report_index.get(scan_id)
+        if report_path is not None or scan_id in _missing_reports:
+            return report_path
+        
+        # Reports generated by another worker process are picked up on first request
+        candidate = f'reports/scan_{scan_id}.pdf'
+        if os.path.exists(candidate):
+            _report_index[scan_id] = candidate
+            return candidate
+        
+        _missing_reports[scan_id] = True
+        return None
+
+
+# Report payments confirmed in the last 30 seconds, keyed by (scan_id, email).
+# Only successful checks are cached: a payment is never undone, while a cached
+# "not paid" could outlive a callback handled by another worker process.
+_paid_reports = TTLCache(maxsize=4096, ttl=30)
+_paid_reports_lock = threading.Lock()
+
+
+def has_paid_for_report(scan_id, email):
+    """Check whether email has paid for (or subscribes to) a scan's report"""
+    key = (scan_id, email)
+    with _paid_reports_lock:
+        if key in _paid_reports:
+            return True
+    
+    has_paid = payment_manager.check_report_payment_by_email(scan_id, email)
+    if has_paid:
+        with _paid_reports_lock:
+            _paid_reports[key] = True
+    return has_paid
+
+
+_warm_report_index()
+
 # Initialize scan storage
 scan_storage = ScanStorage()
 
+# Background worker pool for scan jobs (scans are I/O bound and take many seconds).
+# Every gunicorn worker has its own pool and each scan starts its own thread pools,
+# so the default is fixed rather than scaled by the (host) CPU count.
+scan_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('SCAN_WORKERS', 4)),
+    thread_name_prefix='scan'
+)
+
+# Separate pool for report emails so slow mail delivery never holds up a scan worker
+email_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='email')
+
+# Duplicate scan requests (same target, type, email and options) share one scan:
+# queued/running scans by key, plus scans that completed in the last minute
+_inflight_scans = {}
+_recent_scans = TTLCache(maxsize=256, ttl=60)
+_scan_dedup_lock = threading.Lock()
+
+# Scans run in an in-process executor and are lost if their process exits. Each
+# process refreshes updated_at on its queued/running scans every
+# SCAN_HEARTBEAT_INTERVAL seconds, and scans (from any instance) not updated for
+# STALE_SCAN_AGE seconds are marked as failed.
+SCAN_HEARTBEAT_INTERVAL = 60
+STALE_SCAN_AGE = int(os.getenv('STALE_SCAN_AGE', 300))
+scan_monitor = None
+
+
+def start_scan_monitor():
+    """Start the scan heartbeat thread (called in each gunicorn worker after fork, or in __main__)"""
+    global scan_monitor
+    if scan_monitor is None or not scan_monitor.is_alive():
+        scan_monitor = threading.Thread(target=_scan_monitor_loop, name='scan-monitor', daemon=True)
+        scan_monitor.start()
+
+
+def _scan_monitor_loop():
+    """Touch this process's queued/running scans and fail abandoned ones, every SCAN_HEARTBEAT_INTERVAL seconds"""
+    while True:
+        with _scan_dedup_lock:
+            scan_ids = list(_inflight_scans.values())
+        scan_storage.touch_scans(scan_ids)
+        
+        stale_scans = scan_storage.fail_stale_scans(STALE_SCAN_AGE, 'Scan interrupted by a server restart')
+        if stale_scans:
+            logger.warning(f"Marked {stale_scans} abandoned scan(s) as failed")
+            invalidate_admin_cache()
+        
+        time.sleep(SCAN_HEARTBEAT_INTERVAL)
+
+
+def scan_request_key(scanner, email, persist_report=True):
+    """Key identifying equivalent scan requests"""
+    key = orjson.dumps(
+        [scanner.normalized_target, scanner.scan_type, email, scanner.options, persist_report],
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+# One pooled HTTP session for the M-Pesa, Paystack and Resend APIs, so calls reuse
+# open TLS connections. Retries apply to idempotent methods only (never payment POSTs).
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+
 # Initialize payment systems
 mpesa_environment = os.getenv('MPESA_ENVIRONMENT', 'sandbox')
-mpesa_payment = MPesaPayment(environment=mpesa_environment)
-paystack_payment = PaystackPayment()
-payment_manager = PaymentManager()
+mpesa_payment = MPesaPayment(environment=mpesa_environment, session=http_session)
+paystack_payment = PaystackPayment(session=http_session)
+# Payments share the scan storage's MongoDB client (one connection pool per process)
+payment_manager = PaymentManager(scan_storage if isinstance(scan_storage, MongoDBStorage) else None)
+
+# Initialize email system (Resend, with SMTP fallback)
+resend_email = ResendEmail(session=http_session)
+email_sender = EmailSender()
+
+
+# Pre-encoded bodies for fixed error responses that are hit often (probes, bad clients)
+NOT_FOUND_BODY = orjson.dumps({'error': 'Endpoint not found', 'status': 'error'}) + b'\n'
+INTERNAL_ERROR_BODY = orjson.dumps({'error': 'Internal server error', 'status': 'error'}) + b'\n'
+RATE_LIMITED_BODY = orjson.dumps({
+    'error': 'Rate limit exceeded',
+    'status': 'error',
+    'message': 'Too many requests. Please try again later.'
+}) + b'\n'
+TARGET_REQUIRED_BODY = orjson.dumps({'error': 'Target URL/IP is required', 'status': 'error'}) + b'\n'
+ADMIN_AUTH_REQUIRED_BODY = orjson.dumps({'error': 'Admin authentication required'}) + b'\n'
 
-# Initialize email system (Resend)
-resend_email = ResendEmail()
+
+def json_body_response(body, status):
+    """Wrap a pre-encoded JSON body in a new response (responses are mutable, so never share one)"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+
+def json_errors(log_message):
+    """Decorator to log unexpected errors in an API view and return the standard JSON error envelope.
+    
+    log_message may reference the view's URL arguments, e.g. 'Error getting scan {scan_id}'.
+    HTTP errors raised with abort() are left to the registered error handlers.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                error = str(e)
+                logger.error(f"{log_message.format(**kwargs)}: {error}", exc_info=True)
+                return json_body_response(orjson.dumps({'status': 'error', 'error': error}) + b'\n', 500)
+        return decorated_function
+    return decorator
 
 
 # Admin authentication functions
@@ -84,11 +351,72 @@ def require_admin_auth(f):
     """Decorator to require admin authentication"""
     def decorated_function(*args, **kwargs):
         if not is_admin_logged_in():
-            return jsonify({'error': 'Admin authentication required'}), 401
+            return json_body_response(ADMIN_AUTH_REQUIRED_BODY, 401)
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+# Short-lived cache of admin dashboard responses, keyed by path and query string
+admin_cache = TTLCache(maxsize=16, ttl=10)
+admin_cache_lock = threading.Lock()
+
+
+def cache_admin_response(f):
+    """Decorator to cache an admin JSON response for a few seconds and answer If-None-Match with 304"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.full_path
+        with admin_cache_lock:
+            cached = admin_cache.get(key)
+        
+        if cached is None:
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = (body, hashlib.blake2b(body, digest_size=16).hexdigest())
+            with admin_cache_lock:
+                admin_cache[key] = cached
+        
+        body, etag = cached
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response.make_conditional(request)
+    return decorated_function
+
+
+def invalidate_admin_cache():
+    """Drop cached admin responses after scans are added, updated or deleted"""
+    with admin_cache_lock:
+        admin_cache.clear()
+
+
+def int_arg(name, default, lo, hi):
+    """Parse an integer query parameter, clamped to [lo, hi]; aborts with 400 if it is not an integer"""
+    value = request.args.get(name)
+    try:
+        value = int(value) if value else default
+    except ValueError:
+        abort(400, description=f'Invalid {name} parameter: must be an integer')
+    
+    return max(lo, min(hi, value))
+
+
+# (epoch second, ISO string) for iso_now(); replaced as a whole so threads never see a torn pair
+_iso_now_cache = (0, '')
+
+
+def iso_now():
+    """Current UTC time as an ISO 8601 string, formatted at most once per second"""
+    global _iso_now_cache
+    now = int(time.time())
+    cached_second, cached_value = _iso_now_cache
+    if now != cached_second:
+        cached_value = datetime.utcfromtimestamp(now).isoformat()
+        _iso_now_cache = (now, cached_value)
+    return cached_value
+
+
 def verify_admin_credentials(username, password):
     """Verify admin credentials"""
     password_hash = hashlib.sha256(password.encode()).hexdigest()
@@ -107,20 +435,30 @@ def serve_static(path):
     return send_from_directory('static', path)
 
 
+# (epoch second, encoded body) for health_check()
+_health_body_cache = (0, b'')
+
+
 @app.route('/api/health', methods=['GET'])
+@limiter.exempt  # Probed continuously by load balancers
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat()
-    })
+    global _health_body_cache
+    now = int(time.time())
+    cached_second, body = _health_body_cache
+    if now != cached_second:
+        body = orjson.dumps({'status': 'healthy', 'timestamp': iso_now()}) + b'\n'
+        _health_body_cache = (now, body)
+    return json_body_response(body, 200)
 
 
 @app.route('/api/scan', methods=['POST'])
 @limiter.limit("10 per hour")  # Limit scans to 10 per hour per IP
+@json_errors('Scan error')
 def perform_scan():
     """
-    Perform comprehensive security scan
+    Queue a comprehensive security scan
+    Returns 202 with the scan_id immediately; poll /api/scan/<scan_id>/status for results
     Expected JSON body:
     {
         "target": "https://example.com",
@@ -136,96 +474,189 @@ def perform_scan():
         }
     }
     """
+    data = request.get_json(silent=True, cache=False) or {}
+    
+    if 'target' not in data:
+        return json_body_response(TARGET_REQUIRED_BODY, 400)
+    
+    target = data.get('target')
+    scan_type = data.get('scan_type', 'full')
+    email = data.get('email')
+    options = data.get('options', {})
+    # With skip_persist the report is only emailed, so it is never written to disk
+    persist_report = not (email and data.get('skip_persist'))
+    
+    # Initialize scanner (validates the target before anything is queued)
+    scanner = SecurityScanner(target, scan_type, options)
+    scan_key = scan_request_key(scanner, email, persist_report)
+    
+    with _scan_dedup_lock:
+        scan_id = _inflight_scans.get(scan_key) or _recent_scans.get(scan_key)
+        is_duplicate = scan_id is not None
+        if not is_duplicate:
+            scan_id = scanner.scan_id
+            _inflight_scans[scan_key] = scan_id
+    
+    if is_duplicate:
+        logger.info(f"Reusing scan {scan_id} for duplicate request for target: {target}")
+    else:
+        try:
+            # Record the queued scan so its status can be polled from any worker
+            scan_storage.save_scan({
+                'scan_id': scan_id,
+                'target': target,
+                'scan_type': scan_type,
+                'start_time': scanner.start_time.isoformat(),
+                'status': 'queued'
+            })
+            invalidate_admin_cache()
+            
+            scan_executor.submit(run_scan_task, scanner, email, scan_key, persist_report)
+        except Exception:
+            with _scan_dedup_lock:
+                _inflight_scans.pop(scan_key, None)
+            raise
+        logger.info(f"Queued security scan {scan_id} for target: {target}")
+    
+    return jsonify({
+        'status': 'queued',
+        'scan_id': scan_id,
+        'status_url': f'/api/scan/{scan_id}/status',
+        'email_queued': bool(email),
+        'timestamp': iso_now()
+    }), 202
+
+
+def run_scan_task(scanner, email, scan_key=None, persist_report=True):
+    """Run a queued scan: scan the target, generate the report, store the results and queue the email"""
+    scan_id = scanner.scan_id
+    completed = False
+    
     try:
-        data = request.get_json()
-        
-        if not data or 'target' not in data:
-            return jsonify({
-                'error': 'Target URL/IP is required',
-                'status': 'error'
-            }), 400
-        
-        target = data.get('target')
-        scan_type = data.get('scan_type', 'full')
-        email = data.get('email')
-        options = data.get('options', {})
-        
-        logger.info(f"Starting security scan for target: {target}")
-        
-        # Initialize scanner
-        scanner = SecurityScanner(target, scan_type, options)
+        scan_storage.update_scan_status(scan_id, 'running')
+        invalidate_admin_cache()
+        logger.info(f"Starting security scan {scan_id} for target: {scanner.original_target}")
         
         # Perform scan
         scan_results = scanner.scan()
-        scan_id = scan_results.get('scan_id')
         
         # Generate report
         report_path = None
+        pdf_bytes = None
         try:
             logger.info(f"Generating PDF report for scan {scan_id}")
             report_gen = ReportGenerator(scan_results)
-            report_path = report_gen.generate_pdf_report()
-            logger.info(f"PDF report generated successfully: {report_path}")
+            if persist_report:
+                report_path = report_gen.generate_pdf_report()
+                with _report_index_lock:
+                    _report_index[scan_id] = report_path
+                logger.info(f"PDF report generated successfully: {report_path}")
+            else:
+                report_gen.generate_pdf_bytes()
+                logger.info(f"PDF report generated in memory for scan {scan_id}")
+            pdf_bytes = report_gen.pdf_bytes
         except Exception as e:
             logger.error(f"Failed to generate PDF report: {str(e)}", exc_info=True)
             # Continue even if PDF generation fails
         
-        # Send email if provided (using Resend for better delivery)
-        email_result = {'success': False}
-        if email and report_path:
-            logger.info(f"Sending report to: {email}")
+        # Save scan to storage
+        if scan_storage.save_scan(scan_results):
+            logger.info(f"Scan {scan_id} saved to storage")
+        else:
+            logger.error(f"Failed to save scan {scan_id} to storage")
+        invalidate_admin_cache()
+        # scan() reports its own errors as a failed result rather than raising
+        completed = scan_results.get('status') != 'failed'
+        
+        # Send email if provided, without holding up this worker
+        if email and pdf_bytes:
+            scan_storage.update_email_status(scan_id, 'pending')
+            email_executor.submit(send_report_task, scan_id, email, report_path, scan_results, pdf_bytes)
+        
+    except Exception as e:
+        logger.error(f"Scan error: {str(e)}", exc_info=True)
+        scan_storage.update_scan_status(scan_id, 'failed', error=str(e))
+        invalidate_admin_cache()
+    
+    finally:
+        if scan_key:
+            with _scan_dedup_lock:
+                _inflight_scans.pop(scan_key, None)
+                # Failed scans are not reused; a retry starts a fresh scan
+                if completed:
+                    _recent_scans[scan_key] = scan_id
+
+
+def send_report_task(scan_id, email, report_path, scan_results, pdf_bytes=None):
+    """Email a scan report (using Resend for better delivery) and record the outcome"""
+    email_result = {'success': False}
+    logger.info(f"Sending report to: {email}")
+    try:
+        # Try Resend first (modern, better delivery)
+        email_result = resend_email.send_report(
+            recipient=email,
+            report_path=report_path,
+            scan_results=scan_results,
+            pdf_content=pdf_bytes
+        )
+        
+        # Fallback to original EmailSender if Resend fails
+        if not email_result['success']:
+            logger.warning(f"Resend failed, trying fallback: {email_result.get('error')}")
             try:
-                # Try Resend first (modern, better delivery)
-                email_result = resend_email.send_report(
+                email_result = email_sender.send_report(
                     recipient=email,
                     report_path=report_path,
-                    scan_results=scan_results
+                    scan_results=scan_results,
+                    pdf_content=pdf_bytes
                 )
-                
-                # Fallback to original EmailSender if Resend fails
-                if not email_result['success']:
-                    logger.warning(f"Resend failed, trying fallback: {email_result.get('error')}")
-                    try:
-                        email_sender = EmailSender()
-                        email_result = email_sender.send_report(
-                            recipient=email,
-                            report_path=report_path,
-                            scan_results=scan_results
-                        )
-                    except:
-                        pass
-                
-                if not email_result['success']:
-                    logger.warning(f"Failed to send email: {email_result.get('error')}")
             except Exception as e:
-                logger.error(f"Email sending error: {str(e)}")
-        
-        # Save scan to storage
-        try:
-            scan_storage.save_scan(scan_results)
-            logger.info(f"Scan {scan_id} saved to storage")
-        except Exception as e:
-            logger.error(f"Failed to save scan to storage: {str(e)}")
-        
-        return jsonify({
-            'status': 'success',
-            'scan_id': scan_id,
-            'results': scan_results,
-            'report_url': f'/api/report/{scan_id}' if report_path else None,
-            'report_available': bool(report_path),
-            'email_sent': email_result.get('success', False),
-            'timestamp': datetime.utcnow().isoformat()
-        }), 200
+                logger.error(f"Fallback email sender error: {str(e)}")
         
+        if not email_result['success']:
+            logger.warning(f"Failed to send email: {email_result.get('error')}")
     except Exception as e:
-        logger.error(f"Scan error: {str(e)}", exc_info=True)
+        logger.error(f"Email sending error: {str(e)}")
+    
+    scan_storage.update_email_status(scan_id, 'sent' if email_result.get('success') else 'failed')
+
+
+@app.route('/api/scan/<scan_id>/status', methods=['GET'])
+@limiter.exempt  # Polled repeatedly while a scan runs
+@json_errors('Error getting status for scan {scan_id}')
+def get_scan_status(scan_id):
+    """Get the status of a queued scan, including its results once completed"""
+    scan = scan_storage.get_scan(scan_id)
+    
+    if not scan:
         return jsonify({
             'status': 'error',
-            'error': str(e)
-        }), 500
+            'error': 'Scan not found'
+        }), 404
+    
+    scan_status = scan.get('status', 'completed')
+    response = {
+        'status': 'success',
+        'scan_id': scan_id,
+        'scan_status': scan_status
+    }
+    
+    if scan_status == 'failed':
+        response['error'] = scan.get('error') or scan.get('full_results', {}).get('error')
+    elif scan_status == 'completed':
+        report_available = find_report(scan_id) is not None
+        response.update({
+            'results': scan.get('full_results'),
+            'report_url': f'/api/report/{scan_id}' if report_available else None,
+            'report_available': report_available,
+            'email_status': scan.get('email_status')
+        })
+    
+    return jsonify(response), 200
 
 
 @app.route('/api/report/<scan_id>', methods=['GET'])
+@json_errors('Report retrieval error')
 def get_report(scan_id):
     """Download scan report (requires payment or subscription)"""
     try:
@@ -235,7 +666,7 @@ def get_report(scan_id):
         # If email provided, check payment status
         if email:
             # Check if user has paid for this report or has subscription
-            has_paid = payment_manager.check_report_payment_by_email(scan_id, email)
+            has_paid = has_paid_for_report(scan_id, email)
             
             if not has_paid:
                 return jsonify({
@@ -245,58 +676,65 @@ def get_report(scan_id):
                     'message': 'Pay 100 KSH to download this report or subscribe for unlimited access'
                 }), 402  # Payment Required status code
         
-        report_path = f'reports/scan_{scan_id}.pdf'
+        report_path = find_report(scan_id)
         
-        if not os.path.exists(report_path):
+        if not report_path:
             return jsonify({
                 'error': 'Report not found',
                 'status': 'error'
             }), 404
         
-        return send_file(
+        download_name = f'security_report_{scan_id}.pdf'
+        accel_prefix = app.config['REPORTS_ACCEL_REDIRECT']
+        if accel_prefix:
+            # nginx streams the file with sendfile; no bytes pass through this worker
+            response = app.response_class(mimetype='application/pdf')
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{os.path.basename(report_path)}"
+            response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+            return response
+        
+        response = send_file(
             report_path,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f'security_report_{scan_id}.pdf'
+            download_name=download_name,
+            conditional=True,  # ETag/Last-Modified, 304s and Range requests
+            etag=True,
+            max_age=0  # Always revalidate; a repeat download is answered with 304
         )
-        
-    except Exception as e:
-        logger.error(f"Report retrieval error: {str(e)}")
+        # Reports are paid for per user, so shared caches must not store them
+        response.cache_control.private = True
+        return response
+        
+    except FileNotFoundError:
+        # Report was deleted (possibly by another worker) since it was indexed
+        with _report_index_lock:
+            _report_index.pop(scan_id, None)
         return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+            'error': 'Report not found',
+            'status': 'error'
+        }), 404
 
 
 @app.route('/api/quick-check', methods=['POST'])
 @limiter.limit("30 per hour")  # Limit quick checks to 30 per hour per IP
+@json_errors('Quick check error')
 def quick_check():
     """Perform a quick security check (no full scan)"""
-    try:
-        data = request.get_json()
-        
-        if not data or 'target' not in data:
-            return jsonify({
-                'error': 'Target URL/IP is required',
-                'status': 'error'
-            }), 400
-        
-        target = data.get('target')
-        
-        scanner = SecurityScanner(target, 'quick', {})
-        results = scanner.quick_check()
-        
-        return jsonify({
-            'status': 'success',
-            'results': results
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Quick check error: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    data = request.get_json(silent=True, cache=False) or {}
+    
+    if 'target' not in data:
+        return json_body_response(TARGET_REQUIRED_BODY, 400)
+    
+    target = data.get('target')
+    
+    scanner = SecurityScanner(target, 'quick', {})
+    results = scanner.quick_check()
+    
+    return jsonify({
+        'status': 'success',
+        'results': results
+    }), 200
 
 
 @app.route('/admin')
@@ -309,184 +747,144 @@ def admin_page():
 
 @app.route('/api/admin/scans', methods=['GET'])
 @require_admin_auth
+@cache_admin_response
+@json_errors('Error getting scans')
 def get_all_scans():
     """
     Get all scans with pagination
     Query params:
-        - limit: Max number of scans (default: 100)
-        - offset: Number of scans to skip (default: 0)
+        - limit: Max number of scans (default: 100, max: 500)
+        - offset: Number of scans to skip (default: 0, max: 10000000)
         - search: Search query string (optional)
     """
-    try:
-        limit = int(request.args.get('limit', 100))
-        offset = int(request.args.get('offset', 0))
-        search = request.args.get('search', '').strip()
-        
-        if search:
-            scans = scan_storage.search_scans(search, limit=limit)
-            total = len(scans)
-        else:
-            scans = scan_storage.get_all_scans(limit=limit, offset=offset)
-            total = scan_storage.get_scan_count()
-        
-        return jsonify({
-            'status': 'success',
-            'scans': scans,
-            'total': total,
-            'limit': limit,
-            'offset': offset
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting scans: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    limit = int_arg('limit', 100, 1, 500)
+    offset = int_arg('offset', 0, 0, 10_000_000)
+    
+    search = request.args.get('search', '').strip()
+    
+    if search:
+        scans = scan_storage.search_scans(search, limit=limit)
+        total = len(scans)
+    else:
+        scans, total = scan_storage.get_all_scans_with_total(limit=limit, offset=offset)
+    
+    return jsonify({
+        'status': 'success',
+        'scans': scans,
+        'total': total,
+        'limit': limit,
+        'offset': offset
+    }), 200
 
 
 @app.route('/api/admin/scan/<scan_id>', methods=['GET'])
 @require_admin_auth
+@json_errors('Error getting scan {scan_id}')
 def get_scan_details(scan_id):
     """Get detailed scan information by ID"""
-    try:
-        scan = scan_storage.get_scan(scan_id)
-        
-        if not scan:
-            return jsonify({
-                'status': 'error',
-                'error': 'Scan not found'
-            }), 404
-        
-        return jsonify({
-            'status': 'success',
-            'scan': scan
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting scan {scan_id}: {str(e)}")
+    scan = scan_storage.get_scan(scan_id)
+    
+    if not scan:
         return jsonify({
             'status': 'error',
-            'error': str(e)
-        }), 500
+            'error': 'Scan not found'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'scan': scan
+    }), 200
 
 
 @app.route('/api/admin/scan/<scan_id>', methods=['DELETE'])
 @require_admin_auth
+@json_errors('Error deleting scan {scan_id}')
 def delete_scan(scan_id):
     """Delete a scan by ID"""
-    try:
-        success = scan_storage.delete_scan(scan_id)
-        
-        if not success:
-            return jsonify({
-                'status': 'error',
-                'error': 'Scan not found or could not be deleted'
-            }), 404
-        
-        # Also try to delete the PDF report
-        report_path = f'reports/scan_{scan_id}.pdf'
-        if os.path.exists(report_path):
-            os.remove(report_path)
-        
-        return jsonify({
-            'status': 'success',
-            'message': 'Scan deleted successfully'
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error deleting scan {scan_id}: {str(e)}")
+    success = scan_storage.delete_scan(scan_id)
+    invalidate_admin_cache()
+    
+    if not success:
         return jsonify({
             'status': 'error',
-            'error': str(e)
-        }), 500
+            'error': 'Scan not found or could not be deleted'
+        }), 404
+    
+    # Also try to delete the PDF report
+    with _report_index_lock:
+        _report_index.pop(scan_id, None)
+    report_path = f'reports/scan_{scan_id}.pdf'
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Scan deleted successfully'
+    }), 200
 
 
 @app.route('/api/admin/statistics', methods=['GET'])
 @require_admin_auth
+@cache_admin_response
+@json_errors('Error getting statistics')
 def get_statistics():
     """Get overall scan statistics"""
-    try:
-        stats = scan_storage.get_statistics()
-        
-        return jsonify({
-            'status': 'success',
-            'statistics': stats
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting statistics: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    stats = scan_storage.get_statistics()
+    
+    return jsonify({
+        'status': 'success',
+        'statistics': stats
+    }), 200
 
 
 @app.route('/api/admin/trends', methods=['GET'])
 @require_admin_auth
+@cache_admin_response
+@json_errors('Error getting trends')
 def get_trends():
     """
     Get trend data for the specified period
     Query params:
-        - days: Number of days to analyze (default: 30)
+        - days: Number of days to analyze (default: 30, max: 365)
     """
-    try:
-        days = int(request.args.get('days', 30))
-        trend_data = scan_storage.get_trend_data(days=days)
-        
-        return jsonify({
-            'status': 'success',
-            'trends': trend_data
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting trends: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    days = int_arg('days', 30, 1, 365)
+    
+    trend_data = scan_storage.get_trend_data(days=days)
+    
+    return jsonify({
+        'status': 'success',
+        'trends': trend_data
+    }), 200
 
 
 @app.route('/api/admin/target/<path:target>/history', methods=['GET'])
 @require_admin_auth
+@json_errors('Error getting target history')
 def get_target_scan_history(target):
     """Get scan history for a specific target"""
-    try:
-        limit = int(request.args.get('limit', 10))
-        history = scan_storage.get_target_history(target, limit=limit)
-        
-        return jsonify({
-            'status': 'success',
-            'target': target,
-            'history': history
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting target history: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    limit = int_arg('limit', 10, 1, 100)
+    
+    history = scan_storage.get_target_history(target, limit=limit)
+    
+    return jsonify({
+        'status': 'success',
+        'target': target,
+        'history': history
+    }), 200
 
 
 @app.route('/api/admin/target/<path:target>/improvement', methods=['GET'])
 @require_admin_auth
+@json_errors('Error getting score improvement')
 def get_target_improvement(target):
     """Get security score improvement trend for a specific target"""
-    try:
-        improvement_data = scan_storage.get_score_improvement_trend(target)
-        
-        return jsonify({
-            'status': 'success',
-            'improvement': improvement_data
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting score improvement: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    include_scans = request.args.get('include_scans', 'true').lower() != 'false'
+    improvement_data = scan_storage.get_score_improvement_trend(target, include_scans=include_scans)
+    
+    return jsonify({
+        'status': 'success',
+        'improvement': improvement_data
+    }), 200
 
 
 @app.route('/pricing')
@@ -499,11 +897,11 @@ def pricing_page():
 def admin_login():
     """Admin login page and authentication"""
     if request.method == 'POST':
-        data = request.get_json()
+        data = request.get_json(silent=True, cache=False) or {}
         username = data.get('username')
         password = data.get('password')
         
-        if verify_admin_credentials(username, password):
+        if username and password and verify_admin_credentials(username, password):
             session['admin_logged_in'] = True
             session['admin_username'] = username
             logger.info(f"Admin {username} logged in successfully")
@@ -686,160 +1084,141 @@ def admin_logout():
     return redirect('/admin-login')
 
 
+# Payment configuration is fixed for the life of the process, so encode the answer once
+PAYMENT_CONFIG_BODY = orjson.dumps({
+    'status': 'success',
+    'mpesa_configured': bool(mpesa_payment.consumer_key and mpesa_payment.consumer_secret),
+    'paystack_configured': bool(paystack_payment.secret_key),
+    'mpesa_environment': mpesa_payment.environment,
+    'mpesa_shortcode': mpesa_payment.business_short_code
+}) + b'\n'
+
+
 @app.route('/api/payment/test-config', methods=['GET'])
 def test_payment_config():
     """Test if payment systems are configured"""
-    try:
-        mpesa_configured = bool(mpesa_payment.consumer_key and mpesa_payment.consumer_secret)
-        paystack_configured = bool(paystack_payment.secret_key)
-        
-        return jsonify({
-            'status': 'success',
-            'mpesa_configured': mpesa_configured,
-            'paystack_configured': paystack_configured,
-            'mpesa_environment': mpesa_payment.environment,
-            'mpesa_shortcode': mpesa_payment.business_short_code
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    return json_body_response(PAYMENT_CONFIG_BODY, 200)
 
 
 @app.route('/api/payment/initiate-report', methods=['POST'])
+@json_errors('Error initiating report payment')
 def initiate_report_payment():
     """
     Initiate payment for report download (100 KSH)
     Expected JSON: {"phone_number": "254XXXXXXXXX", "scan_id": "abc123"}
     """
-    try:
-        data = request.get_json()
-        phone_number = data.get('phone_number')
-        scan_id = data.get('scan_id')
-        
-        if not phone_number or not scan_id:
-            return jsonify({
-                'status': 'error',
-                'error': 'Phone number and scan ID are required'
-            }), 400
-        
-        # Check if already paid
-        if payment_manager.check_report_payment(scan_id, phone_number):
-            return jsonify({
-                'status': 'success',
-                'already_paid': True,
-                'message': 'Report already paid for or you have an active subscription'
-            }), 200
-        
-        # Initiate M-Pesa payment
-        logger.info(f"Initiating M-Pesa payment: phone={phone_number}, amount=100, scan_id={scan_id}")
-        
-        result = mpesa_payment.initiate_stk_push(
-            phone_number=phone_number,
-            amount=100,
-            account_reference=f"REPORT-{scan_id}",
-            transaction_desc="CyberTech Report Download"
-        )
-        
-        logger.info(f"M-Pesa result: {result}")
+    data = request.get_json(silent=True, cache=False) or {}
+    phone_number = data.get('phone_number')
+    scan_id = data.get('scan_id')
+    
+    if not phone_number or not scan_id:
+        return jsonify({
+            'status': 'error',
+            'error': 'Phone number and scan ID are required'
+        }), 400
+    
+    # Check if already paid
+    if payment_manager.check_report_payment(scan_id, phone_number):
+        return jsonify({
+            'status': 'success',
+            'already_paid': True,
+            'message': 'Report already paid for or you have an active subscription'
+        }), 200
+    
+    # Initiate M-Pesa payment
+    logger.info(f"Initiating M-Pesa payment: phone={phone_number}, amount=100, scan_id={scan_id}")
+    
+    result = mpesa_payment.initiate_stk_push(
+        phone_number=phone_number,
+        amount=100,
+        account_reference=f"REPORT-{scan_id}",
+        transaction_desc="CyberTech Report Download"
+    )
+    
+    logger.info(f"M-Pesa result: {result}")
+    
+    if result.get('success'):
+        # Save payment record
+        payment_manager.create_payment_record({
+            'checkout_request_id': result['checkout_request_id'],
+            'merchant_request_id': result['merchant_request_id'],
+            'phone_number': phone_number,
+            'amount': 100,
+            'payment_type': 'report_download',
+            'scan_id': scan_id
+        })
+        
+        logger.info(f"Payment record created for {phone_number}")
         
-        if result.get('success'):
-            # Save payment record
-            payment_manager.create_payment_record({
-                'checkout_request_id': result['checkout_request_id'],
-                'merchant_request_id': result['merchant_request_id'],
-                'phone_number': phone_number,
-                'amount': 100,
-                'payment_type': 'report_download',
-                'scan_id': scan_id
-            })
-            
-            logger.info(f"Payment record created for {phone_number}")
-            
-            return jsonify({
-                'status': 'success',
-                'checkout_request_id': result['checkout_request_id'],
-                'message': result.get('customer_message', 'Payment request sent to your phone')
-            }), 200
-        else:
-            logger.error(f"M-Pesa payment failed: {result.get('error')}")
-            return jsonify({
-                'status': 'error',
-                'error': result.get('error', 'Failed to initiate payment'),
-                'details': result
-            }), 500
-            
-    except Exception as e:
-        logger.error(f"Error initiating report payment: {str(e)}")
+        return jsonify({
+            'status': 'success',
+            'checkout_request_id': result['checkout_request_id'],
+            'message': result.get('customer_message', 'Payment request sent to your phone')
+        }), 200
+    else:
+        logger.error(f"M-Pesa payment failed: {result.get('error')}")
         return jsonify({
             'status': 'error',
-            'error': str(e)
+            'error': result.get('error', 'Failed to initiate payment'),
+            'details': result
         }), 500
 
 
 @app.route('/api/payment/initiate-subscription', methods=['POST'])
+@json_errors('Error initiating subscription payment')
 def initiate_subscription_payment():
     """
     Initiate subscription payment (2000 KSH/month)
     Expected JSON: {"phone_number": "254XXXXXXXXX", "plan": "pro"}
     """
-    try:
-        data = request.get_json()
-        phone_number = data.get('phone_number')
-        plan = data.get('plan', 'pro')
-        
-        if not phone_number:
-            return jsonify({
-                'status': 'error',
-                'error': 'Phone number is required'
-            }), 400
-        
-        # Get plan details
-        plan_details = payment_manager.PLANS.get(plan)
-        if not plan_details:
-            return jsonify({
-                'status': 'error',
-                'error': 'Invalid plan'
-            }), 400
-        
-        amount = plan_details['price']
-        
-        # Initiate M-Pesa payment
-        result = mpesa_payment.initiate_stk_push(
-            phone_number=phone_number,
-            amount=amount,
-            account_reference=f"SUB-{plan.upper()}",
-            transaction_desc=f"CyberTech {plan_details['name']}"
-        )
+    data = request.get_json(silent=True, cache=False) or {}
+    phone_number = data.get('phone_number')
+    plan = data.get('plan', 'pro')
+    
+    if not phone_number:
+        return jsonify({
+            'status': 'error',
+            'error': 'Phone number is required'
+        }), 400
+    
+    # Get plan details
+    plan_details = payment_manager.PLANS.get(plan)
+    if not plan_details:
+        return jsonify({
+            'status': 'error',
+            'error': 'Invalid plan'
+        }), 400
+    
+    amount = plan_details['price']
+    
+    # Initiate M-Pesa payment
+    result = mpesa_payment.initiate_stk_push(
+        phone_number=phone_number,
+        amount=amount,
+        account_reference=f"SUB-{plan.upper()}",
+        transaction_desc=f"CyberTech {plan_details['name']}"
+    )
+    
+    if result.get('success'):
+        # Save payment record
+        payment_manager.create_payment_record({
+            'checkout_request_id': result['checkout_request_id'],
+            'merchant_request_id': result['merchant_request_id'],
+            'phone_number': phone_number,
+            'amount': amount,
+            'payment_type': 'subscription',
+            'metadata': {'plan': plan}
+        })
         
-        if result.get('success'):
-            # Save payment record
-            payment_manager.create_payment_record({
-                'checkout_request_id': result['checkout_request_id'],
-                'merchant_request_id': result['merchant_request_id'],
-                'phone_number': phone_number,
-                'amount': amount,
-                'payment_type': 'subscription',
-                'metadata': {'plan': plan}
-            })
-            
-            return jsonify({
-                'status': 'success',
-                'checkout_request_id': result['checkout_request_id'],
-                'message': result.get('customer_message', 'Payment request sent to your phone')
-            }), 200
-        else:
-            return jsonify({
-                'status': 'error',
-                'error': result.get('error', 'Failed to initiate payment')
-            }), 500
-            
-    except Exception as e:
-        logger.error(f"Error initiating subscription payment: {str(e)}")
+        return jsonify({
+            'status': 'success',
+            'checkout_request_id': result['checkout_request_id'],
+            'message': result.get('customer_message', 'Payment request sent to your phone')
+        }), 200
+    else:
         return jsonify({
             'status': 'error',
-            'error': str(e)
+            'error': result.get('error', 'Failed to initiate payment')
         }), 500
 
 
@@ -850,7 +1229,7 @@ def mpesa_callback():
     Receives payment confirmation from Safaricom
     """
     try:
-        callback_data = request.get_json()
+        callback_data = request.get_json(silent=True, cache=False) or {}
         logger.info(f"M-Pesa callback received: {json.dumps(callback_data)}")
         
         # Validate and parse callback
@@ -878,122 +1257,136 @@ def mpesa_callback():
 
 
 @app.route('/api/payment/status/<checkout_request_id>', methods=['GET'])
+@json_errors('Error checking payment status')
 def check_payment_status(checkout_request_id):
     """Check payment status"""
-    try:
-        status = payment_manager.check_payment_status(checkout_request_id)
-        
-        return jsonify({
-            'status': 'success',
-            'payment': status
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error checking payment status: {str(e)}")
-        return jsonify({
-            'status': 'error',
-            'error': str(e)
-        }), 500
+    status = payment_manager.check_payment_status(checkout_request_id)
+    
+    return jsonify({
+        'status': 'success',
+        'payment': status
+    }), 200
 
 
 @app.route('/api/subscription/check', methods=['POST'])
+@json_errors('Error checking subscription')
 def check_subscription():
     """
     Check if phone number has active subscription
     Expected JSON: {"phone_number": "254XXXXXXXXX"}
     """
-    try:
-        data = request.get_json()
-        phone_number = data.get('phone_number')
-        
-        if not phone_number:
-            return jsonify({
-                'status': 'error',
-                'error': 'Phone number is required'
-            }), 400
-        
-        subscription = payment_manager.get_subscription(phone_number)
-        
-        return jsonify({
-            'status': 'success',
-            'has_subscription': subscription is not None,
-            'subscription': subscription
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error checking subscription: {str(e)}")
+    data = request.get_json(silent=True, cache=False) or {}
+    phone_number = data.get('phone_number')
+    
+    if not phone_number:
         return jsonify({
             'status': 'error',
-            'error': str(e)
-        }), 500
+            'error': 'Phone number is required'
+        }), 400
+    
+    subscription = payment_manager.get_subscription(phone_number)
+    
+    return jsonify({
+        'status': 'success',
+        'has_subscription': subscription is not None,
+        'subscription': subscription
+    }), 200
 
 
 @app.route('/api/payment/paystack/initialize', methods=['POST'])
+@json_errors('Error initializing Paystack payment')
 def initialize_paystack_payment():
     """
     Initialize Paystack payment (for international users or card payments)
     Expected JSON: {"email": "user@example.com", "amount": 100, "type": "report", "scan_id": "abc123"}
     """
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        amount = data.get('amount', 100)
-        payment_type = data.get('type', 'report')
-        scan_id = data.get('scan_id')
-        
-        if not email:
-            return jsonify({
-                'status': 'error',
-                'error': 'Email address is required'
-            }), 400
-        
-        # Generate reference
-        import uuid
-        reference = f"CYBERTECH-{uuid.uuid4().hex[:12].upper()}"
-        
-        # Initialize Paystack transaction
-        result = paystack_payment.initialize_transaction(
-            email=email,
-            amount=amount,
-            reference=reference,
-            metadata={
-                'payment_type': payment_type,
-                'scan_id': scan_id,
-                'customer_email': email
-            }
-        )
+    data = request.get_json(silent=True, cache=False) or {}
+    email = data.get('email')
+    amount = data.get('amount', 100)
+    payment_type = data.get('type', 'report')
+    scan_id = data.get('scan_id')
+    
+    if not email:
+        return jsonify({
+            'status': 'error',
+            'error': 'Email address is required'
+        }), 400
+    
+    # Generate reference
+    reference = f"CYBERTECH-{secrets.token_hex(6).upper()}"
+    
+    # Initialize Paystack transaction
+    result = paystack_payment.initialize_transaction(
+        email=email,
+        amount=amount,
+        reference=reference,
+        metadata={
+            'payment_type': payment_type,
+            'scan_id': scan_id,
+            'customer_email': email
+        }
+    )
+    
+    if result.get('success'):
+        # Save payment record
+        payment_manager.create_payment_record({
+            'checkout_request_id': reference,
+            'merchant_request_id': reference,
+            'phone_number': email,  # Use email as identifier for Paystack
+            'amount': amount,
+            'payment_type': payment_type,
+            'scan_id': scan_id,
+            'metadata': {'provider': 'paystack', 'reference': reference}
+        })
         
-        if result.get('success'):
-            # Save payment record
-            payment_manager.create_payment_record({
-                'checkout_request_id': reference,
-                'merchant_request_id': reference,
-                'phone_number': email,  # Use email as identifier for Paystack
-                'amount': amount,
-                'payment_type': payment_type,
-                'scan_id': scan_id,
-                'metadata': {'provider': 'paystack', 'reference': reference}
-            })
-            
-            return jsonify({
-                'status': 'success',
-                'authorization_url': result['authorization_url'],
-                'reference': result['reference']
-            }), 200
-        else:
-            return jsonify({
-                'status': 'error',
-                'error': result.get('error', 'Failed to initialize payment')
-            }), 500
-            
-    except Exception as e:
-        logger.error(f"Error initializing Paystack payment: {str(e)}")
+        return jsonify({
+            'status': 'success',
+            'authorization_url': result['authorization_url'],
+            'reference': result['reference']
+        }), 200
+    else:
         return jsonify({
             'status': 'error',
-            'error': str(e)
+            'error': result.get('error', 'Failed to initialize payment')
         }), 500
 
 
+# Static result pages for the Paystack redirect, encoded once
+PAYSTACK_SUCCESS_HTML = """
+<html>
+<head>
+    <title>Payment Successful</title>
+    <meta http-equiv="refresh" content="3;url=/" />
+    <style>
+        body { font-family: Arial; text-align: center; padding: 50px; }
+        .success { color: #27ae60; font-size: 24px; }
+    </style>
+</head>
+<body>
+    <div class="success">✓ Payment Successful!</div>
+    <p>Thank you for your payment. Redirecting...</p>
+</body>
+</html>
+""".encode()
+
+PAYSTACK_FAILED_HTML = """
+<html>
+<head>
+    <title>Payment Failed</title>
+    <meta http-equiv="refresh" content="3;url=/pricing" />
+    <style>
+        body { font-family: Arial; text-align: center; padding: 50px; }
+        .error { color: #e74c3c; font-size: 24px; }
+    </style>
+</head>
+<body>
+    <div class="error">✗ Payment Failed</div>
+    <p>Please try again. Redirecting...</p>
+</body>
+</html>
+""".encode()
+
+
 @app.route('/api/payment/paystack-callback', methods=['GET'])
 def paystack_callback():
     """
@@ -1022,62 +1415,33 @@ def paystack_callback():
             )
             
             # Redirect to success page
-            return f"""
-            <html>
-            <head>
-                <title>Payment Successful</title>
-                <meta http-equiv="refresh" content="3;url=/" />
-                <style>
-                    body {{ font-family: Arial; text-align: center; padding: 50px; }}
-                    .success {{ color: #27ae60; font-size: 24px; }}
-                </style>
-            </head>
-            <body>
-                <div class="success">✓ Payment Successful!</div>
-                <p>Thank you for your payment. Redirecting...</p>
-            </body>
-            </html>
-            """
+            return app.response_class(PAYSTACK_SUCCESS_HTML, mimetype='text/html')
         else:
-            return f"""
-            <html>
-            <head>
-                <title>Payment Failed</title>
-                <meta http-equiv="refresh" content="3;url=/pricing" />
-                <style>
-                    body {{ font-family: Arial; text-align: center; padding: 50px; }}
-                    .error {{ color: #e74c3c; font-size: 24px; }}
-                </style>
-            </head>
-            <body>
-                <div class="error">✗ Payment Failed</div>
-                <p>Please try again. Redirecting...</p>
-            </body>
-            </html>
-            """
+            return app.response_class(PAYSTACK_FAILED_HTML, mimetype='text/html')
             
     except Exception as e:
         logger.error(f"Error processing Paystack callback: {str(e)}")
         return "Error processing payment", 500
 
 
+@app.errorhandler(400)
+def bad_request(e):
+    return jsonify({'error': e.description, 'status': 'error'}), 400
+
+
 @app.errorhandler(404)
 def not_found(e):
-    return jsonify({'error': 'Endpoint not found', 'status': 'error'}), 404
+    return json_body_response(NOT_FOUND_BODY, 404)
 
 
 @app.errorhandler(500)
 def internal_error(e):
-    return jsonify({'error': 'Internal server error', 'status': 'error'}), 500
+    return json_body_response(INTERNAL_ERROR_BODY, 500)
 
 
 @app.errorhandler(429)
 def ratelimit_handler(e):
-    return jsonify({
-        'error': 'Rate limit exceeded',
-        'status': 'error',
-        'message': 'Too many requests. Please try again later.'
-    }), 429
+    return json_body_response(RATE_LIMITED_BODY, 429)
 
 
 # Custom error handler for scanner validation errors
@@ -1091,6 +1455,8 @@ def handle_value_error(e):
 
 
 if __name__ == '__main__':
+    start_log_listener()
+    start_scan_monitor()
     port = int(os.getenv('PORT', 5000))
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for CyberTech Security Scanner
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Scans and payment calls are network-bound, so threaded workers give
+# real request concurrency without one process per in-flight request.
+# os.cpu_count() reports the host's CPUs rather than a container's CPU limit,
+# so the default is a small fixed count.
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('WEB_THREADS', 8))
+worker_class = 'gthread'
+
+# Long scans and report generation
+timeout = 300
+
+# Import the app once in the master so workers share its memory copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Give each worker its own MongoDB connections (MongoClient is not fork-safe), log writer and scan heartbeat threads"""
+    from app import scan_storage, payment_manager, start_log_listener, start_scan_monitor
+    start_log_listener()
+    scan_storage.reconnect()
+    payment_manager.reconnect()
+    start_scan_monitor()
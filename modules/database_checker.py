@@ -6,6 +6,7 @@ Checks database security and configuration
 import logging
 import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 
 logger = logging.getLogger(__name__)
@@ -46,9 +47,50 @@ class DatabaseChecker:
         ]
     }
     
-    def __init__(self, target, timeout=10):
+    # Every DB_ERRORS pattern as one named alternative (e1, e2, ...) of a single
+    # regex, so a response is scanned once; the matching group identifies the pattern
+    _DB_ERROR_GROUPS = {
+        f'e{number}': (db_type, pattern)
+        for number, (db_type, pattern) in enumerate(
+            (db_type, pattern)
+            for db_type, patterns in DB_ERRORS.items()
+            for pattern in patterns
+        )
+    }
+    _DB_ERROR_REGEX = re.compile(
+        '|'.join(f'(?P<{name}>{pattern})' for name, (_, pattern) in _DB_ERROR_GROUPS.items()),
+        re.IGNORECASE
+    )
+    
+    # Database connection strings that should never appear in a page, as
+    # alternatives of one regex so the page is scanned in a single pass
+    _CONNECTION_STRING_REGEX = re.compile(
+        '|'.join((
+            r"mongodb://[^'\"\s]+",
+            r"mysql://[^'\"\s]+",
+            r"postgresql://[^'\"\s]+",
+            r"Server=.+;Database=.+;",
+            r"Data Source=.+;Initial Catalog=.+;"
+        )),
+        re.IGNORECASE
+    )
+    
+    # Signs in a response that a NoSQL payload reached MongoDB
+    _NOSQL_HINT_REGEX = re.compile(r"mongo|bson", re.IGNORECASE)
+    
+    def __init__(self, target, timeout=10, max_threads=8):
         self.target = target
         self.timeout = timeout
+        self.max_threads = max_threads
+        # Parse the target once; every probe reuses its URL and query parameters
+        parsed_url = urlparse(target)
+        self._probe_url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}"
+        self._params = parse_qs(parsed_url.query)
+        # One session so every probe reuses pooled connections to the target
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
         
     def check(self):
         """Perform database security checks"""
@@ -125,6 +167,10 @@ class DatabaseChecker:
                 'error': str(e),
                 'score': 50
             }
+        
+        finally:
+            # Release the pooled keep-alive connections to the target
+            self.session.close()
     
     def _check_error_exposure(self):
         """Check for exposed database errors"""
@@ -132,26 +178,32 @@ class DatabaseChecker:
             # Try to trigger an error with invalid input
             test_payloads = ["'", "\"", "1'", "1\""]
             
-            for payload in test_payloads:
-                parsed_url = urlparse(self.target)
-                params = parse_qs(parsed_url.query)
-                
-                if params:
+            params = self._params
+            if not params:
+                return None, []
+            
+            first_param = list(params.keys())[0]
+            
+            # Send all payloads at once, then check the responses in payload order
+            with ThreadPoolExecutor(max_workers=min(self.max_threads, len(test_payloads))) as executor:
+                futures = []
+                for payload in test_payloads:
                     # Add payload to first parameter
-                    first_param = list(params.keys())[0]
-                    params[first_param] = payload
-                    
-                    response = requests.get(
-                        f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}",
-                        params=params,
-                        timeout=self.timeout
-                    )
+                    test_params = {**params, first_param: payload}
+                    futures.append(executor.submit(
+                        self.session.get, self._probe_url, params=test_params, timeout=self.timeout
+                    ))
+                
+                for future in futures:
+                    response = future.result()
                     
                     # Check for database error patterns
-                    for db_type, patterns in self.DB_ERRORS.items():
-                        for pattern in patterns:
-                            if re.search(pattern, response.text, re.IGNORECASE):
-                                return db_type, [pattern]
+                    match = self._DB_ERROR_REGEX.search(response.text)
+                    if match:
+                        for pending in futures:
+                            pending.cancel()
+                        db_type, pattern = self._DB_ERROR_GROUPS[match.lastgroup]
+                        return db_type, [pattern]
             
             return None, []
             
@@ -161,24 +213,10 @@ class DatabaseChecker:
     
     def _check_connection_strings(self):
         """Check for exposed database connection strings"""
-        connection_patterns = [
-            r"mongodb://[^'\"\s]+",
-            r"mysql://[^'\"\s]+",
-            r"postgresql://[^'\"\s]+",
-            r"Server=.+;Database=.+;",
-            r"Data Source=.+;Initial Catalog=.+;"
-        ]
-        
         try:
-            response = requests.get(self.target, timeout=self.timeout)
-            
-            found_strings = []
-            for pattern in connection_patterns:
-                matches = re.findall(pattern, response.text, re.IGNORECASE)
-                if matches:
-                    found_strings.extend(matches)
+            response = self.session.get(self.target, timeout=self.timeout)
             
-            return found_strings
+            return self._CONNECTION_STRING_REGEX.findall(response.text)
             
         except Exception as e:
             logger.error(f"Connection string check error: {str(e)}")
@@ -196,31 +234,41 @@ class DatabaseChecker:
         ]
         
         try:
-            parsed_url = urlparse(self.target)
-            params = parse_qs(parsed_url.query)
+            params = self._params
+            if not params:
+                return vulnerabilities
             
-            for param in params:
-                for payload in nosql_payloads:
-                    test_params = params.copy()
-                    test_params[param] = payload
-                    
-                    try:
-                        response = requests.get(
-                            f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}",
-                            params=test_params,
+            with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+                futures = {
+                    param: [
+                        executor.submit(
+                            self.session.get,
+                            self._probe_url,
+                            params={**params, param: payload},
                             timeout=self.timeout
                         )
+                        for payload in nosql_payloads
+                    ]
+                    for param in params
+                }
+                
+                for param, param_futures in futures.items():
+                    for future in param_futures:
+                        try:
+                            response = future.result()
+                        except Exception:
+                            continue
                         
                         # Check for MongoDB errors or suspicious behavior
-                        if 'mongo' in response.text.lower() or 'bson' in response.text.lower():
+                        if self._NOSQL_HINT_REGEX.search(response.text):
                             vulnerabilities.append({
                                 'severity': 'high',
                                 'issue': f'Possible NoSQL injection in parameter: {param}',
                                 'description': 'Parameter may be vulnerable to NoSQL injection'
                             })
+                            for pending in param_futures:
+                                pending.cancel()
                             break
-                    except:
-                        continue
                         
         except Exception as e:
             logger.error(f"NoSQL injection check error: {str(e)}")
@@ -4,19 +4,77 @@ Discovers sensitive files, directories, and admin panels
 """
 
 import logging
+import re
 import urllib.parse
-from typing import Dict, List, Set
+import uuid
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logger = logging.getLogger(__name__)
 
+# Sensitive file paths containing any of these count as critical when scoring
+_CRITICAL_PATH_RE = re.compile(r'env|config|database|\.git', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def _classify_path(path: str, is_admin: bool, is_directory: bool) -> Dict:
+    """
+    Type, severity, description and recommendation for a found path
+    
+    Cached, since the same paths are classified on every scan.
+    
+    Args:
+        path: Relative path
+        is_admin: Whether this is an admin panel
+        is_directory: Whether this is a directory
+        
+    Returns:
+        Dict of the classification fields (shared; copy before changing)
+    """
+    if is_admin:
+        return {
+            'type': 'Admin Panel',
+            'severity': 'HIGH',
+            'description': f'Admin panel accessible at {path}',
+            'recommendation': 'Ensure admin panel is properly protected with strong authentication'
+        }
+    if path.endswith(('.git', '.env', 'config', 'database')):
+        return {
+            'type': 'Critical File',
+            'severity': 'CRITICAL',
+            'description': f'Critical file exposed: {path}',
+            'recommendation': 'Remove or restrict access to this file immediately'
+        }
+    if path.endswith(('.log', '.sql', '.bak', '.backup')):
+        return {
+            'type': 'Sensitive File',
+            'severity': 'HIGH',
+            'description': f'Sensitive file exposed: {path}',
+            'recommendation': 'Remove or restrict access to backup/log files'
+        }
+    if is_directory:
+        return {
+            'type': 'Directory',
+            'severity': 'MEDIUM',
+            'description': f'Directory listing or accessible directory: {path}',
+            'recommendation': 'Review if this directory should be publicly accessible'
+        }
+    return {
+        'type': 'File',
+        'severity': 'MEDIUM',
+        'description': f'File found: {path}',
+        'recommendation': 'Review if this file should be publicly accessible'
+    }
+
 
 class DirectoryEnumerationScanner:
     """Directory and file enumeration scanner"""
     
     # Sensitive files to check
-    SENSITIVE_FILES = [
+    SENSITIVE_FILES = (
         # Version control
         '.git/HEAD',
         '.git/config',
@@ -90,10 +148,10 @@ class DirectoryEnumerationScanner:
         'swagger.yaml',
         'openapi.json',
         'api-docs.json',
-    ]
+    )
     
     # Admin panels and sensitive directories
-    ADMIN_PATHS = [
+    ADMIN_PATHS = (
         'admin',
         'administrator',
         'admin.php',
@@ -123,10 +181,10 @@ class DirectoryEnumerationScanner:
         'admin/login',
         'admin-login',
         'login/admin',
-    ]
+    )
     
     # Common directories
-    COMMON_DIRS = [
+    COMMON_DIRS = (
         'backup',
         'backups',
         'old',
@@ -158,9 +216,12 @@ class DirectoryEnumerationScanner:
         'db',
         'sql',
         'api',
-    ]
+    )
+    
+    # Largest GET body read to keep its connection reusable (or to size it without a Content-Length)
+    MAX_BODY_READ = 64 * 1024
     
-    def __init__(self, target_url, timeout=5, max_threads=10):
+    def __init__(self, target_url, timeout=5, max_threads=32):
         """
         Initialize Directory Enumeration Scanner
         
@@ -172,11 +233,22 @@ class DirectoryEnumerationScanner:
         self.target = target_url
         self.timeout = timeout
         self.max_threads = max_threads
+        parsed = urllib.parse.urlparse(target_url)
+        # Site root that every checked path is joined onto
+        self._base_url = f"{parsed.scheme}://{parsed.netloc}/"
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Keep one pooled connection per worker thread to the single target host
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.found_items: Set[str] = set()
+        # Fingerprint of the site's answer for a missing path, if it is not an error (soft 404)
+        self.not_found_fingerprint = None
+        # Set once the server rejects HEAD requests
+        self.skip_head = False
         
     def scan(self) -> Dict:
         """
@@ -196,27 +268,41 @@ class DirectoryEnumerationScanner:
             'risk_level': 'LOW'
         }
         
-        # Check for sensitive files
-        logger.info(f"Scanning for {len(self.SENSITIVE_FILES)} sensitive files...")
-        sensitive_files = self._check_files(self.SENSITIVE_FILES)
-        results['sensitive_files_found'] = sensitive_files
+        # Probe a random path once: an unreachable host skips every other probe,
+        # and a site that answers missing paths with a page gets a soft 404 baseline
+        try:
+            response, size = self._fetch(self._base_url + uuid.uuid4().hex)
+            if response.status_code < 400:
+                # Without a known size the baseline cannot be told apart from real hits
+                self.not_found_fingerprint = self._fingerprint(response, size)
+                logger.info(f"{self.target} answers missing paths with status {response.status_code}")
+        except requests.ConnectionError as e:
+            logger.warning(f"Skipping directory enumeration, {self.target} is not reachable: {e}")
+            results['error'] = 'Target is not reachable'
+            return results
+        except requests.RequestException as e:
+            logger.debug(f"Error checking a missing path on {self.target}: {e}")
         
-        # Check for admin panels
-        logger.info(f"Scanning for {len(self.ADMIN_PATHS)} admin panels...")
-        admin_panels = self._check_paths(self.ADMIN_PATHS, is_admin=True)
+        # Check sensitive files, admin panels and common directories (limited
+        # to 20) in a single pass
+        logger.info(
+            f"Scanning for {len(self.SENSITIVE_FILES)} sensitive files, "
+            f"{len(self.ADMIN_PATHS)} admin panels and common directories..."
+        )
+        sensitive_files, admin_panels, directories = self._check_groups([
+            (self.SENSITIVE_FILES, False, False),
+            (self.ADMIN_PATHS, True, False),
+            (self.COMMON_DIRS[:20], False, True),  # Limit to 20
+        ])
+        results['sensitive_files_found'] = sensitive_files
         results['admin_panels_found'] = admin_panels
-        
-        # Check for common directories (limited scan)
-        logger.info(f"Scanning for common directories...")
-        directories = self._check_paths(self.COMMON_DIRS[:20], is_directory=True)  # Limit to 20
         results['directories_found'] = directories
         
         # Calculate total and score
         results['total_found'] = len(sensitive_files) + len(admin_panels) + len(directories)
         
         # Scoring based on what was found
-        critical_files = ['env', 'config', 'database', '.git']
-        critical_count = sum(1 for f in sensitive_files if any(c in f['path'].lower() for c in critical_files))
+        critical_count = sum(1 for f in sensitive_files if _CRITICAL_PATH_RE.search(f['path']))
         
         if critical_count > 0:
             results['score'] = max(0, 100 - (critical_count * 30))
@@ -241,24 +327,7 @@ class DirectoryEnumerationScanner:
         Returns:
             List of found files with details
         """
-        found_files = []
-        parsed = urllib.parse.urlparse(self.target)
-        base_url = f"{parsed.scheme}://{parsed.netloc}"
-        
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            futures = {}
-            for file_path in file_list:
-                url = urllib.parse.urljoin(base_url + '/', file_path)
-                future = executor.submit(self._check_url, url, file_path)
-                futures[future] = file_path
-            
-            for future in as_completed(futures):
-                result = future.result()
-                if result:
-                    found_files.append(result)
-                    self.found_items.add(result['path'])
-        
-        return found_files
+        return self._check_groups([(file_list, False, False)])[0]
     
     def _check_paths(self, path_list: List[str], is_admin=False, is_directory=False) -> List[Dict]:
         """
@@ -272,24 +341,56 @@ class DirectoryEnumerationScanner:
         Returns:
             List of found paths with details
         """
-        found_paths = []
-        parsed = urllib.parse.urlparse(self.target)
-        base_url = f"{parsed.scheme}://{parsed.netloc}"
+        return self._check_groups([(path_list, is_admin, is_directory)])[0]
+    
+    def _check_groups(self, groups: List[Tuple[Sequence[str], bool, bool]]) -> List[List[Dict]]:
+        """
+        Check several groups of paths in one thread pool
         
+        All paths are submitted up front, so workers move straight on to the
+        next path instead of waiting for the slowest probe of each group.
+        Paths that differ only by a trailing slash (e.g. "admin" and "admin/")
+        are probed once and reported under each name.
+        
+        Args:
+            groups: List of (paths, is_admin, is_directory) tuples
+            
+        Returns:
+            One list of found paths with details per group, in the same order
+        """
+        # Normalized path -> (group index, path, is_admin, is_directory) for each name
+        probes = {}
+        for index, (path_list, is_admin, is_directory) in enumerate(groups):
+            for path in path_list:
+                probes.setdefault(path.strip('/'), []).append((index, path, is_admin, is_directory))
+        
+        found = [[] for _ in groups]
         with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
             futures = {}
-            for path in path_list:
-                url = urllib.parse.urljoin(base_url + '/', path)
+            for aliases in probes.values():
+                _, path, is_admin, is_directory = aliases[0]
+                # Paths are relative to the site root, so joining is plain concatenation
+                url = self._base_url + path.lstrip('/')
                 future = executor.submit(self._check_url, url, path, is_admin, is_directory)
-                futures[future] = path
+                futures[future] = aliases
             
             for future in as_completed(futures):
                 result = future.result()
-                if result:
-                    found_paths.append(result)
-                    self.found_items.add(result['path'])
+                if not result:
+                    continue
+                
+                for number, (index, path, is_admin, is_directory) in enumerate(futures[future]):
+                    if number:
+                        result = {
+                            **result,
+                            'path': path,
+                            'url': self._base_url + path.lstrip('/'),
+                            **_classify_path(path, is_admin, is_directory)
+                        }
+                    found[index].append(result)
+                    self.found_items.add(path)
         
-        return found_paths
+        return found
     
     def _check_url(self, url: str, path: str, is_admin=False, is_directory=False) -> Dict:
         """
@@ -305,48 +406,21 @@ class DirectoryEnumerationScanner:
             Dict with details if found, None otherwise
         """
         try:
-            # Use HEAD request first (faster)
-            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
-            
-            # If HEAD fails, try GET
-            if response.status_code >= 400:
-                response = self.session.get(url, timeout=self.timeout, allow_redirects=False)
+            response, size = self._fetch(url)
             
-            # Consider it found if status is 200-399
-            if 200 <= response.status_code < 400:
+            # Consider it found if status is 200-399, unless it is the site's soft 404 page
+            if 200 <= response.status_code < 400 and (
+                    self.not_found_fingerprint is None or
+                    self._fingerprint(response, size) != self.not_found_fingerprint):
                 result = {
                     'path': path,
                     'url': url,
                     'status_code': response.status_code,
-                    'size': len(response.content) if hasattr(response, 'content') else 0,
+                    'size': size or 0,
                 }
                 
                 # Determine severity and type
-                if is_admin:
-                    result['type'] = 'Admin Panel'
-                    result['severity'] = 'HIGH'
-                    result['description'] = f'Admin panel accessible at {path}'
-                    result['recommendation'] = 'Ensure admin panel is properly protected with strong authentication'
-                elif path.endswith(('.git', '.env', 'config', 'database')):
-                    result['type'] = 'Critical File'
-                    result['severity'] = 'CRITICAL'
-                    result['description'] = f'Critical file exposed: {path}'
-                    result['recommendation'] = 'Remove or restrict access to this file immediately'
-                elif path.endswith(('.log', '.sql', '.bak', '.backup')):
-                    result['type'] = 'Sensitive File'
-                    result['severity'] = 'HIGH'
-                    result['description'] = f'Sensitive file exposed: {path}'
-                    result['recommendation'] = 'Remove or restrict access to backup/log files'
-                elif is_directory:
-                    result['type'] = 'Directory'
-                    result['severity'] = 'MEDIUM'
-                    result['description'] = f'Directory listing or accessible directory: {path}'
-                    result['recommendation'] = 'Review if this directory should be publicly accessible'
-                else:
-                    result['type'] = 'File'
-                    result['severity'] = 'MEDIUM'
-                    result['description'] = f'File found: {path}'
-                    result['recommendation'] = 'Review if this file should be publicly accessible'
+                result.update(_classify_path(path, is_admin, is_directory))
                 
                 return result
             
@@ -359,6 +433,78 @@ class DirectoryEnumerationScanner:
             logger.debug(f"Unexpected error checking {url}: {e}")
             return None
     
+    def _fetch(self, url: str) -> Tuple[requests.Response, Optional[int]]:
+        """
+        Request a URL with HEAD, falling back to GET if HEAD fails
+        
+        HEAD is skipped for the rest of the scan once the server answers it
+        with 405 or 501, so such servers get one request per path instead of two.
+        
+        Args:
+            url: Full URL to request
+            
+        Returns:
+            Tuple of (response, body size), where the size is None if it is unknown
+        """
+        if not self.skip_head:
+            # Use HEAD request first (faster)
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            if response.status_code < 400:
+                # A HEAD response has no body to measure
+                return response, self._content_length(response) or 0
+            if response.status_code in (405, 501):
+                self.skip_head = True
+        
+        # HEAD failed or is not supported, try GET
+        response = self.session.get(url, timeout=self.timeout, allow_redirects=False, stream=True)
+        
+        # Read small bodies so the connection goes back to the pool, and drop
+        # the connection rather than download large ones
+        length = self._content_length(response)
+        if length is not None:
+            if length <= self.MAX_BODY_READ:
+                response.content
+            else:
+                response.close()
+            return response, length
+        
+        # No Content-Length (e.g. a chunked dynamic page): read up to the limit to size it
+        body = response.raw.read(self.MAX_BODY_READ + 1, decode_content=True)
+        if len(body) > self.MAX_BODY_READ:
+            response.close()
+            return response, None
+        return response, len(body)
+    
+    @staticmethod
+    def _content_length(response: requests.Response) -> Optional[int]:
+        """
+        Body size declared by a response
+        
+        Args:
+            response: Response to check
+            
+        Returns:
+            The Content-Length, or None if it is missing or invalid
+        """
+        length = response.headers.get('Content-Length', '')
+        return int(length) if length.isdigit() else None
+    
+    @staticmethod
+    def _fingerprint(response: requests.Response, size: Optional[int]) -> Optional[Tuple]:
+        """
+        Summarize a response for comparison with the soft 404 baseline
+        
+        Args:
+            response: Response to summarize
+            size: Body size returned by _fetch()
+            
+        Returns:
+            Tuple of (status code, body size), or None if the size is unknown
+        """
+        if size is None:
+            return None
+        return response.status_code, size
+    
     def scan_specific_paths(self, custom_paths: List[str]) -> List[Dict]:
         """
         Scan for custom/specific paths
@@ -4,11 +4,13 @@ Sends security reports via email
 """
 
 import os
+import atexit
+import string
 import smtplib
+import time
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
+import threading
+from email.message import EmailMessage
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -16,157 +18,71 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
-class EmailSender:
-    """Email sender for security reports"""
-    
-    def __init__(self):
-        self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        self.smtp_port = int(os.getenv('SMTP_PORT', 587))
-        self.smtp_username = os.getenv('SMTP_USERNAME')
-        self.smtp_password = os.getenv('SMTP_PASSWORD')
-        self.from_email = os.getenv('SMTP_FROM_EMAIL', self.smtp_username)
-        
-    def send_report(self, recipient, report_path, scan_results):
-        """Send security report via email"""
-        try:
-            # Validate configuration
-            if not all([self.smtp_username, self.smtp_password]):
-                logger.warning("Email configuration not complete. Skipping email send.")
-                return {
-                    'success': False,
-                    'error': 'Email configuration incomplete. Please set SMTP credentials in .env file.'
-                }
-            
-            # Create message
-            message = self._create_message(recipient, scan_results)
-            
-            # Attach PDF report
-            if os.path.exists(report_path):
-                with open(report_path, 'rb') as f:
-                    pdf_attachment = MIMEApplication(f.read(), _subtype='pdf')
-                    pdf_attachment.add_header(
-                        'Content-Disposition',
-                        'attachment',
-                        filename=f'security_report_{scan_results.get("scan_id", "unknown")}.pdf'
-                    )
-                    message.attach(pdf_attachment)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(message)
-            
-            logger.info(f"Security report sent to {recipient}")
-            
-            return {
-                'success': True,
-                'message': f'Report sent to {recipient}'
-            }
-            
-        except Exception as e:
-            logger.error(f"Email send error: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
-    
-    def _create_message(self, recipient, scan_results):
-        """Create email message"""
-        message = MIMEMultipart()
-        message['From'] = self.from_email
-        message['To'] = recipient
-        message['Subject'] = f"CyberTech Security Report - {scan_results.get('target', 'Unknown Target')}"
-        
-        # Create HTML body
-        body = self._create_email_body(scan_results)
-        
-        # Attach HTML body
-        html_part = MIMEText(body, 'html')
-        message.attach(html_part)
-        
-        return message
-    
-    def _create_email_body(self, scan_results):
-        """Create HTML email body"""
-        target = scan_results.get('target', 'Unknown')
-        security_score = scan_results.get('security_score', 0)
-        risk_level = scan_results.get('risk_level', 'UNKNOWN')
-        scan_id = scan_results.get('scan_id', 'unknown')
-        
-        # Determine risk color
-        risk_colors = {
-            'LOW': '#27ae60',
-            'MEDIUM': '#f39c12',
-            'HIGH': '#e67e22',
-            'CRITICAL': '#c0392b'
-        }
-        risk_color = risk_colors.get(risk_level, '#95a5a6')
-        
-        html = f"""
+# HTML email body; only the scan-specific fields are substituted per message
+_EMAIL_BODY_TEMPLATE = string.Template("""
         <!DOCTYPE html>
         <html>
         <head>
             <style>
-                body {{
+                body {
                     font-family: Arial, sans-serif;
                     line-height: 1.6;
                     color: #333;
                     max-width: 600px;
                     margin: 0 auto;
                     padding: 20px;
-                }}
-                .header {{
+                }
+                .header {
                     background-color: #2c3e50;
                     color: white;
                     padding: 20px;
                     text-align: center;
                     border-radius: 5px 5px 0 0;
-                }}
-                .content {{
+                }
+                .content {
                     background-color: #f8f9fa;
                     padding: 20px;
                     border-radius: 0 0 5px 5px;
-                }}
-                .score-box {{
+                }
+                .score-box {
                     background-color: white;
                     padding: 15px;
                     margin: 15px 0;
-                    border-left: 4px solid {risk_color};
+                    border-left: 4px solid $risk_color;
                     border-radius: 3px;
-                }}
-                .metric {{
+                }
+                .metric {
                     display: flex;
                     justify-content: space-between;
                     margin: 10px 0;
                     padding: 10px;
                     background-color: white;
                     border-radius: 3px;
-                }}
-                .metric-label {{
+                }
+                .metric-label {
                     font-weight: bold;
                     color: #555;
-                }}
-                .metric-value {{
+                }
+                .metric-value {
                     color: #2c3e50;
-                }}
-                .risk-badge {{
+                }
+                .risk-badge {
                     display: inline-block;
                     padding: 5px 15px;
-                    background-color: {risk_color};
+                    background-color: $risk_color;
                     color: white;
                     border-radius: 20px;
                     font-weight: bold;
-                }}
-                .footer {{
+                }
+                .footer {
                     text-align: center;
                     margin-top: 20px;
                     padding-top: 20px;
                     border-top: 1px solid #ddd;
                     color: #777;
                     font-size: 12px;
-                }}
-                .button {{
+                }
+                .button {
                     display: inline-block;
                     padding: 10px 20px;
                     background-color: #3498db;
@@ -174,7 +90,7 @@ class EmailSender:
                     text-decoration: none;
                     border-radius: 5px;
                     margin-top: 15px;
-                }}
+                }
             </style>
         </head>
         <body>
@@ -187,26 +103,26 @@ class EmailSender:
                 <p>A comprehensive security scan has been performed on your target:</p>
                 
                 <div class="score-box">
-                    <h3>Target: {target}</h3>
-                    <p><strong>Scan ID:</strong> {scan_id}</p>
-                    <p><strong>Date:</strong> {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
+                    <h3>Target: $target</h3>
+                    <p><strong>Scan ID:</strong> $scan_id</p>
+                    <p><strong>Date:</strong> $date</p>
                 </div>
                 
                 <h3>Results Summary</h3>
                 
                 <div class="metric">
                     <span class="metric-label">Security Score:</span>
-                    <span class="metric-value">{security_score}/100</span>
+                    <span class="metric-value">$security_score/100</span>
                 </div>
                 
                 <div class="metric">
                     <span class="metric-label">Risk Level:</span>
-                    <span class="risk-badge">{risk_level}</span>
+                    <span class="risk-badge">$risk_level</span>
                 </div>
                 
                 <div class="metric">
                     <span class="metric-label">Scan Duration:</span>
-                    <span class="metric-value">{scan_results.get('duration', 0):.2f} seconds</span>
+                    <span class="metric-value">$duration seconds</span>
                 </div>
                 
                 <h3>What's Next?</h3>
@@ -227,11 +143,173 @@ class EmailSender:
             
             <div class="footer">
                 <p>This is an automated message from CyberTech Security Scanner</p>
-                <p>© {datetime.utcnow().year} CyberTech. All rights reserved.</p>
+                <p>© $year CyberTech. All rights reserved.</p>
             </div>
         </body>
         </html>
-        """
-        
-        return html
+        """)
 
+# Accent color for each risk level
+_RISK_COLORS = {
+    'LOW': '#27ae60',
+    'MEDIUM': '#f39c12',
+    'HIGH': '#e67e22',
+    'CRITICAL': '#c0392b'
+}
+
+
+class EmailSender:
+    """Email sender for security reports"""
+    
+    # Recycle the SMTP connection after this many messages
+    MAX_MESSAGES_PER_CONNECTION = 100
+    # Check a connection with NOOP only after it has been idle this long (seconds)
+    IDLE_CHECK_SECONDS = 30
+    
+    def __init__(self):
+        self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+        self.smtp_port = int(os.getenv('SMTP_PORT', 587))
+        self.smtp_username = os.getenv('SMTP_USERNAME')
+        self.smtp_password = os.getenv('SMTP_PASSWORD')
+        self.from_email = os.getenv('SMTP_FROM_EMAIL', self.smtp_username)
+        
+        # Authenticated SMTP connection, opened lazily and reused across sends
+        self._smtp = None
+        self._messages_sent = 0
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+    
+    def _connect(self):
+        """Open and authenticate a new SMTP connection"""
+        if self.smtp_port == 465:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=30)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+            server.starttls()
+        server.login(self.smtp_username, self.smtp_password)
+        
+        self._smtp = server
+        self._messages_sent = 0
+        self._last_used = time.monotonic()
+        return server
+    
+    def _get_connection(self):
+        """Return a live SMTP connection, reconnecting if it was dropped or is due for recycling"""
+        if self._smtp is not None and self._messages_sent < self.MAX_MESSAGES_PER_CONNECTION:
+            # A recently used connection is trusted; a send that finds it dropped retries once
+            if time.monotonic() - self._last_used < self.IDLE_CHECK_SECONDS:
+                return self._smtp
+            try:
+                code, _ = self._smtp.noop()
+                if code == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+        
+        self.close()
+        return self._connect()
+    
+    def __enter__(self):
+        """Open the SMTP connection up front for a batch of sends"""
+        with self._lock:
+            self._get_connection()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the SMTP connection at the end of a batch"""
+        with self._lock:
+            self.close()
+        return False
+    
+    def close(self):
+        """Close the SMTP connection if one is open"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+        
+    def send_report(self, recipient, report_path, scan_results, pdf_content=None):
+        """Send security report via email (pdf_content, if given, is attached instead of reading report_path)"""
+        try:
+            # Validate configuration
+            if not all([self.smtp_username, self.smtp_password]):
+                logger.warning("Email configuration not complete. Skipping email send.")
+                return {
+                    'success': False,
+                    'error': 'Email configuration incomplete. Please set SMTP credentials in .env file.'
+                }
+            
+            # Create message
+            message = self._create_message(recipient, scan_results)
+            
+            # Attach PDF report
+            if pdf_content is None and os.path.exists(report_path):
+                with open(report_path, 'rb') as f:
+                    pdf_content = f.read()
+            
+            if pdf_content is not None:
+                # Base64-encoded straight into the message; no intermediate MIME part
+                message.add_attachment(
+                    pdf_content,
+                    maintype='application',
+                    subtype='pdf',
+                    filename=f'security_report_{scan_results.get("scan_id", "unknown")}.pdf'
+                )
+                # Only the encoded copy is needed while sending
+                del pdf_content
+            
+            # Send email over the shared connection
+            with self._lock:
+                try:
+                    self._get_connection().send_message(message)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Dropped by the server since it was last used - retry once
+                    self.close()
+                    self._connect().send_message(message)
+                self._messages_sent += 1
+                self._last_used = time.monotonic()
+            
+            logger.info(f"Security report sent to {recipient}")
+            
+            return {
+                'success': True,
+                'message': f'Report sent to {recipient}'
+            }
+            
+        except Exception as e:
+            logger.error(f"Email send error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _create_message(self, recipient, scan_results):
+        """Create email message"""
+        message = EmailMessage()
+        message['From'] = self.from_email
+        message['To'] = recipient
+        message['Subject'] = f"CyberTech Security Report - {scan_results.get('target', 'Unknown Target')}"
+        
+        # HTML body
+        message.set_content(self._create_email_body(scan_results), subtype='html')
+        
+        return message
+    
+    def _create_email_body(self, scan_results):
+        """Create HTML email body"""
+        risk_level = scan_results.get('risk_level', 'UNKNOWN')
+        now = datetime.utcnow()
+        
+        return _EMAIL_BODY_TEMPLATE.substitute(
+            target=scan_results.get('target', 'Unknown'),
+            scan_id=scan_results.get('scan_id', 'unknown'),
+            security_score=scan_results.get('security_score', 0),
+            risk_level=risk_level,
+            risk_color=_RISK_COLORS.get(risk_level, '#95a5a6'),
+            duration=f"{scan_results.get('duration', 0):.2f}",
+            date=now.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            year=now.year
+        )
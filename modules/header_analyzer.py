@@ -5,10 +5,24 @@ Analyzes HTTP security headers
 
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+# Shared by all analyzers so repeat scans of a host reuse its keep-alive connection
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64)
+_session.mount('http://', _adapter)
+_session.mount('https://', _adapter)
+# Never store cookies: each scan must see the Set-Cookie headers of a fresh visit
+_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+# Score deducted per security issue; any other severity costs 5
+_SEVERITY_PENALTY = {'critical': 20, 'high': 15, 'medium': 10, 'low': 5}
+
 
 class HeaderAnalyzer:
     """HTTP security headers analyzer"""
@@ -45,10 +59,32 @@ class HeaderAnalyzer:
         }
     }
     
+    # SECURITY_HEADERS as (lowercased name, name, info), in the same order
+    _SECURITY_HEADERS_LOWER = [
+        (header.lower(), header, info) for header, info in SECURITY_HEADERS.items()
+    ]
+    # Lowercased names of the high importance headers checked by quick_analyze
+    _HIGH_IMPORTANCE_HEADERS_LOWER = [
+        (header_lower, header)
+        for header_lower, header, info in _SECURITY_HEADERS_LOWER
+        if info['importance'] == 'high'
+    ]
+    
     def __init__(self, target, timeout=10):
         self.target = target
         self.timeout = timeout
         
+    @classmethod
+    def analyze_batch(cls, urls, concurrency=32, timeout=10):
+        """Analyze many targets concurrently (at most `concurrency` at a time); returns {url: results}"""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(urls))) as executor:
+            results = executor.map(lambda url: cls(url, timeout).analyze(), urls)
+            return dict(zip(urls, results))
+    
     def analyze(self):
         """Perform comprehensive header analysis"""
         results = {
@@ -62,19 +98,15 @@ class HeaderAnalyzer:
         
         try:
             # Fetch headers
-            response = requests.get(
-                self.target,
-                timeout=self.timeout,
-                allow_redirects=True,
-                verify=True
-            )
+            response = self._fetch_headers()
             
             results['status_code'] = response.status_code
             results['headers'] = dict(response.headers)
             
-            # Check for security headers
-            for header, info in self.SECURITY_HEADERS.items():
-                if header not in response.headers:
+            # Check for security headers against one set of the names that are present
+            present = {name.lower() for name in response.headers}
+            for header_lower, header, info in self._SECURITY_HEADERS_LOWER:
+                if header_lower not in present:
                     results['missing_headers'].append({
                         'header': header,
                         'importance': info['importance'],
@@ -119,12 +151,13 @@ class HeaderAnalyzer:
     def quick_analyze(self):
         """Perform quick header analysis"""
         try:
-            response = requests.get(self.target, timeout=self.timeout)
+            response = self._fetch_headers()
             
-            missing_critical = []
-            for header, info in self.SECURITY_HEADERS.items():
-                if info['importance'] == 'high' and header not in response.headers:
-                    missing_critical.append(header)
+            present = {name.lower() for name in response.headers}
+            missing_critical = [
+                header for header_lower, header in self._HIGH_IMPORTANCE_HEADERS_LOWER
+                if header_lower not in present
+            ]
             
             score = 100 - (len(missing_critical) * 20)
             
@@ -138,6 +171,28 @@ class HeaderAnalyzer:
             logger.error(f"Quick header analysis error: {str(e)}")
             return {'error': str(e), 'score': 50}
     
+    def _fetch_headers(self):
+        """Fetch the target's response headers and cookies without downloading the page"""
+        response = _session.head(
+            self.target,
+            timeout=self.timeout,
+            allow_redirects=True,
+            verify=True
+        )
+        
+        # Some servers reject or mishandle HEAD; fall back to a GET whose body is never read
+        if response.status_code >= 400:
+            response = _session.get(
+                self.target,
+                timeout=self.timeout,
+                allow_redirects=True,
+                verify=True,
+                stream=True
+            )
+            response.close()
+        
+        return response
+    
     def _check_cookies_security(self, response):
         """Check cookie security attributes"""
         issues = []
@@ -166,18 +221,9 @@ class HeaderAnalyzer:
     
     def _calculate_headers_score(self, results):
         """Calculate security score based on headers"""
-        score = 100
-        
-        for issue in results['security_issues']:
-            severity = issue.get('severity', 'low')
-            if severity == 'critical':
-                score -= 20
-            elif severity == 'high':
-                score -= 15
-            elif severity == 'medium':
-                score -= 10
-            else:
-                score -= 5
-        
-        return max(0, score)
+        penalty = sum(
+            _SEVERITY_PENALTY.get(issue.get('severity'), 5)
+            for issue in results['security_issues']
+        )
+        return max(0, 100 - penalty)
 
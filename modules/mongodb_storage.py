@@ -4,19 +4,98 @@ Handles persistence of scan metadata and results in MongoDB
 """
 
 import os
+import re
+import importlib.util
 import logging
+import threading
+import orjson
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from pymongo import MongoClient, DESCENDING, ASCENDING
+from functools import wraps
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from cachetools import TTLCache
+from pymongo import MongoClient, DESCENDING, ASCENDING, TEXT, UpdateOne
+from pymongo.read_preferences import ReadPreference
 from pymongo.errors import ConnectionFailure, OperationFailure
 import urllib.parse
 
 logger = logging.getLogger(__name__)
 
+# Result list fields counted in a scan's results summary, with their summary keys
+_SUMMARY_COUNT_FIELDS = (
+    ('issues', 'issues_count'),
+    ('vulnerabilities', 'vulnerabilities_count'),
+    ('open_ports', 'open_ports_count'),
+    ('missing_headers', 'missing_headers_count'),
+)
+
+# Wire compression for MongoDB traffic; zstd needs the optional zstandard package
+_COMPRESSORS = 'zstd,zlib' if importlib.util.find_spec('zstandard') else 'zlib'
+
+# Queries containing any of these are treated as regular expressions in search_scans
+_REGEX_METACHARACTERS = re.compile(r'[.^$*+?()\[\]{}|\\]')
+
+# Scans that count towards statistics and trends (older documents have no status)
+_COMPLETED_STATUSES = ('completed', None)
+_COMPLETED_FILTER = {'status': {'$in': list(_COMPLETED_STATUSES)}}
+
+
+def _cached_aggregation(method):
+    """Cache an aggregation result until it expires or a scan is saved or deleted"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # The data version is part of the key, so a result computed while a
+        # write was in flight is never served after that write
+        key = (method.__name__, self._data_version, args, tuple(sorted(kwargs.items())))
+        with self._aggregation_cache_lock:
+            cached = self._aggregation_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = method(self, *args, **kwargs)
+        if result:  # Errors return an empty dict and are not cached
+            with self._aggregation_cache_lock:
+                self._aggregation_cache[key] = result
+        return result
+    return wrapper
+
+
+def _to_datetime(value):
+    """Coerce an ISO 8601 timestamp string to a datetime (other values pass through)"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
 
 class MongoDBStorage:
     """MongoDB storage handler for scan metadata and results"""
     
+    # Maximum number of upserts sent in a single bulk_write call
+    BULK_WRITE_BATCH_SIZE = 1000
+    
+    # Largest number of documents requested per cursor batch
+    MAX_BATCH_SIZE = 500
+    
+    # Indexes that drive date-sorted listings
+    START_TIME_INDEX = [('start_time', DESCENDING)]
+    TARGET_START_TIME_INDEX = [('target', ASCENDING), ('start_time', DESCENDING)]
+    
+    # Scan fields that determine a scan's daily rollup buckets
+    _ROLLUP_PROJECTION = {
+        '_id': 0,
+        'scan_id': 1,
+        'target': 1,
+        'start_time': 1,
+        'risk_level': 1,
+        'security_score': 1,
+        'status': 1
+    }
+    
+    # Seconds that statistics and trend aggregations are served from memory
+    AGGREGATION_CACHE_TTL = 60
+    
     def __init__(self, connection_string=None, database_name='cybertech'):
         """
         Initialize MongoDB connection
@@ -34,22 +113,46 @@ class MongoDBStorage:
         self.client = None
         self.db = None
         self.scans_collection = None
+        self.analytics_collection = None
+        self.results_collection = None
+        self.daily_rollup_collection = None
+        self.target_rollup_collection = None
+        
+        self._aggregation_cache = TTLCache(maxsize=64, ttl=self.AGGREGATION_CACHE_TTL)
+        self._aggregation_cache_lock = threading.Lock()
+        self._data_version = 0
         
         self._connect()
         self._ensure_indexes()
+        self._migrate_start_time()
+        self._ensure_rollups()
     
     def _connect(self):
         """Establish MongoDB connection"""
         try:
             self.client = MongoClient(
                 self.connection_string,
-                serverSelectionTimeoutMS=5000
+                serverSelectionTimeoutMS=5000,
+                maxPoolSize=int(os.getenv('MONGODB_MAX_POOL_SIZE', '100')),
+                minPoolSize=int(os.getenv('MONGODB_MIN_POOL_SIZE', '5')),
+                compressors=_COMPRESSORS,
+                retryWrites=True,
+                w='majority'
             )
             # Test connection
             self.client.admin.command('ping')
             
             self.db = self.client[self.database_name]
             self.scans_collection = self.db['scans']
+            # Listings and aggregations tolerate replica lag, so they may read
+            # from a secondary and leave the primary to scan writes
+            self.analytics_collection = self.db.get_collection(
+                'scans', read_preference=ReadPreference.SECONDARY_PREFERRED
+            )
+            self.results_collection = self.db['scan_results']
+            # Per-day counters maintained on every save/delete for the trend queries
+            self.daily_rollup_collection = self.db['scans_daily_rollup']
+            self.target_rollup_collection = self.db['scans_target_rollup']
             
             logger.info(f"Connected to MongoDB: {self.database_name}")
             
@@ -60,6 +163,15 @@ class MongoDBStorage:
             logger.error(f"MongoDB connection error: {e}")
             raise
     
+    def reconnect(self):
+        """
+        Open a fresh MongoDB connection
+        
+        MongoClient is not fork-safe, so each forked worker process must
+        create its own client instead of using the one inherited from the parent.
+        """
+        self._connect()
+    
     def _ensure_indexes(self):
         """Create necessary indexes for performance"""
         try:
@@ -75,17 +187,162 @@ class MongoDBStorage:
             # Index on risk_level for filtering
             self.scans_collection.create_index('risk_level')
             
+            # Index for finding queued/running scans that stopped being updated
+            self.scans_collection.create_index([
+                ('status', ASCENDING),
+                ('updated_at', ASCENDING)
+            ])
+            
+            # Index on scan_type for the statistics breakdown
+            self.scans_collection.create_index('scan_type')
+            
+            # Compound index for risk level filtering sorted by date
+            self.scans_collection.create_index([
+                ('risk_level', ASCENDING),
+                ('start_time', DESCENDING)
+            ])
+            
+            # Text index for plain-word searches (no stemming or stop words on identifiers)
+            self.scans_collection.create_index(
+                [('target', TEXT), ('scan_id', TEXT), ('risk_level', TEXT)],
+                name='scan_search_text',
+                default_language='none'
+            )
+            
             # Compound index for trend queries
             self.scans_collection.create_index([
                 ('target', ASCENDING),
                 ('start_time', DESCENDING)
             ])
             
+            # Full scan results live in their own collection, keyed by scan_id
+            self.results_collection.create_index('scan_id', unique=True)
+            
+            # One rollup bucket per day and risk level / per day and target
+            self.daily_rollup_collection.create_index([
+                ('date', ASCENDING),
+                ('risk_level', ASCENDING)
+            ], unique=True)
+            self.target_rollup_collection.create_index([
+                ('date', ASCENDING),
+                ('target', ASCENDING)
+            ], unique=True)
+            
             logger.info("MongoDB indexes created successfully")
             
         except Exception as e:
             logger.warning(f"Error creating indexes: {e}")
     
+    def _migrate_start_time(self):
+        """Convert start_time values stored as ISO strings to native BSON dates"""
+        try:
+            result = self.scans_collection.update_many(
+                {'start_time': {'$type': 'string'}},
+                [{'$set': {'start_time': {'$toDate': '$start_time'}}}]
+            )
+            if result.modified_count:
+                logger.info(f"Converted start_time to a date on {result.modified_count} scan(s)")
+            
+        except Exception as e:
+            logger.warning(f"Error migrating start_time: {e}")
+    
+    def _ensure_rollups(self):
+        """Build the daily rollup collections from existing scans if they are empty"""
+        try:
+            if self.daily_rollup_collection.estimated_document_count() > 0:
+                return
+            if self.scans_collection.estimated_document_count() == 0:
+                return
+            
+            day = {'$dateToString': {'format': '%Y-%m-%d', 'date': '$start_time'}}
+            
+            self.scans_collection.aggregate([
+                {'$match': {'start_time': {'$type': 'date'}, **_COMPLETED_FILTER}},
+                {
+                    '$group': {
+                        '_id': {'date': day, 'risk_level': '$risk_level'},
+                        'count': {'$sum': 1},
+                        'score_sum': {'$sum': '$security_score'}
+                    }
+                },
+                {
+                    '$project': {
+                        '_id': 0,
+                        'date': '$_id.date',
+                        'risk_level': '$_id.risk_level',
+                        'count': 1,
+                        'score_sum': 1
+                    }
+                },
+                {'$out': self.daily_rollup_collection.name}
+            ])
+            
+            self.scans_collection.aggregate([
+                {'$match': {'start_time': {'$type': 'date'}, **_COMPLETED_FILTER}},
+                {
+                    '$group': {
+                        '_id': {'date': day, 'target': '$target'},
+                        'count': {'$sum': 1},
+                        'score_sum': {'$sum': '$security_score'},
+                        'last_scan': {'$max': '$start_time'}
+                    }
+                },
+                {
+                    '$project': {
+                        '_id': 0,
+                        'date': '$_id.date',
+                        'target': '$_id.target',
+                        'count': 1,
+                        'score_sum': 1,
+                        'last_scan': 1
+                    }
+                },
+                {'$out': self.target_rollup_collection.name}
+            ])
+            
+            logger.info("Built daily scan rollups from existing scans")
+            
+        except Exception as e:
+            logger.warning(f"Error building scan rollups: {e}")
+    
+    def _apply_rollups(self, removed: List[Dict], added: List[Dict]):
+        """Move scans' contributions between rollup buckets (removed count down, added count up)"""
+        daily_operations = []
+        target_operations = []
+        
+        for scans, sign in ((removed, -1), (added, 1)):
+            for scan in scans:
+                start_time = scan.get('start_time')
+                if not isinstance(start_time, datetime) or scan.get('status') not in _COMPLETED_STATUSES:
+                    continue
+                
+                day = start_time.strftime('%Y-%m-%d')
+                increment = {'$inc': {'count': sign, 'score_sum': sign * (scan.get('security_score') or 0)}}
+                daily_operations.append(UpdateOne(
+                    {'date': day, 'risk_level': scan.get('risk_level')},
+                    increment,
+                    upsert=True
+                ))
+                
+                target_update = dict(increment)
+                if sign > 0:
+                    target_update['$max'] = {'last_scan': start_time}
+                target_operations.append(UpdateOne(
+                    {'date': day, 'target': scan.get('target')},
+                    target_update,
+                    upsert=True
+                ))
+        
+        if not daily_operations:
+            return
+        
+        # The scan itself is already stored, so a failed rollup update must not fail the save
+        try:
+            self.daily_rollup_collection.bulk_write(daily_operations, ordered=False)
+            self.target_rollup_collection.bulk_write(target_operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"Error updating scan rollups: {e}")
+    
     def save_scan(self, scan_results: Dict) -> bool:
         """
         Save scan metadata and results
@@ -96,64 +353,230 @@ class MongoDBStorage:
         Returns:
             bool: True if saved successfully
         """
+        return self.save_scans_bulk([scan_results])
+    
+    def save_scans_bulk(self, scans: List[Dict]) -> bool:
+        """
+        Save several scans with unordered bulk upserts
+        
+        Args:
+            scans: List of complete scan results dictionaries
+            
+        Returns:
+            bool: True if every scan was saved successfully
+        """
         try:
-            # Create scan document
-            scan_doc = {
-                'scan_id': scan_results.get('scan_id'),
-                'target': scan_results.get('target'),
-                'scan_type': scan_results.get('scan_type'),
-                'security_score': scan_results.get('security_score', 0),
-                'risk_level': scan_results.get('risk_level', 'UNKNOWN'),
-                'start_time': scan_results.get('start_time'),
-                'end_time': scan_results.get('end_time'),
-                'duration': scan_results.get('duration', 0),
-                'status': scan_results.get('status', 'completed'),
-                'created_at': datetime.utcnow(),
-                'results_summary': self._create_results_summary(scan_results.get('results', {})),
-                'full_results': scan_results  # Store complete results
-            }
+            for start in range(0, len(scans), self.BULK_WRITE_BATCH_SIZE):
+                batch = scans[start:start + self.BULK_WRITE_BATCH_SIZE]
+                scan_docs = [self._build_scan_doc(scan_results) for scan_results in batch]
+                scan_operations = []
+                result_operations = []
+                
+                # Re-saved scans (e.g. queued, then completed) leave their old rollup buckets
+                previous = {
+                    doc['scan_id']: doc
+                    for doc in self.scans_collection.find(
+                        {'scan_id': {'$in': [scan_doc['scan_id'] for scan_doc in scan_docs]}},
+                        self._ROLLUP_PROJECTION
+                    )
+                }
+                
+                for scan_results, scan_doc in zip(batch, scan_docs):
+                    scan_operations.append(UpdateOne(
+                        {'scan_id': scan_doc['scan_id']},
+                        {'$set': scan_doc, '$unset': {'full_results': ''}},
+                        upsert=True
+                    ))
+                    result_operations.append(UpdateOne(
+                        {'scan_id': scan_doc['scan_id']},
+                        {'$set': {'payload': self._encode_payload(scan_results)}},
+                        upsert=True
+                    ))
+                
+                self.results_collection.bulk_write(result_operations, ordered=False)
+                self.scans_collection.bulk_write(scan_operations, ordered=False)
+                self._apply_rollups(list(previous.values()), scan_docs)
             
-            # Upsert (insert or update)
-            result = self.scans_collection.update_one(
-                {'scan_id': scan_doc['scan_id']},
-                {'$set': scan_doc},
-                upsert=True
-            )
+            self._invalidate_aggregations()
             
-            logger.info(f"Saved scan {scan_doc['scan_id']} to MongoDB")
+            if len(scans) == 1:
+                logger.info(f"Saved scan {scans[0].get('scan_id')} to MongoDB")
+            else:
+                logger.info(f"Saved {len(scans)} scans to MongoDB")
             return True
             
         except Exception as e:
-            logger.error(f"Error saving scan: {e}", exc_info=True)
+            logger.error(f"Error saving scans: {e}", exc_info=True)
+            return False
+    
+    def _invalidate_aggregations(self):
+        """Retire cached statistics and trends after scans are saved or deleted"""
+        with self._aggregation_cache_lock:
+            self._data_version += 1
+            self._aggregation_cache.clear()
+    
+    @staticmethod
+    def _encode_payload(scan_results: Dict) -> bytes:
+        """Serialize full scan results as one opaque JSON blob (never queried by field)"""
+        return orjson.dumps(scan_results, option=orjson.OPT_NON_STR_KEYS)
+    
+    @staticmethod
+    def _decode_payload(payload) -> Dict:
+        """Decode stored full scan results (older payloads are plain documents)"""
+        if isinstance(payload, bytes):
+            return orjson.loads(payload)
+        return payload
+    
+    def _build_scan_doc(self, scan_results: Dict) -> Dict:
+        """Build the scan metadata document (full results are stored separately)"""
+        return {
+            'scan_id': scan_results.get('scan_id'),
+            'target': scan_results.get('target'),
+            'scan_type': scan_results.get('scan_type'),
+            'security_score': scan_results.get('security_score', 0),
+            'risk_level': scan_results.get('risk_level', 'UNKNOWN'),
+            'start_time': _to_datetime(scan_results.get('start_time')),
+            'end_time': scan_results.get('end_time'),
+            'duration': scan_results.get('duration', 0),
+            'status': scan_results.get('status', 'completed'),
+            'created_at': datetime.utcnow(),
+            'updated_at': datetime.utcnow(),
+            'results_summary': self._create_results_summary(scan_results.get('results', {}))
+        }
+    
+    def update_scan_status(self, scan_id: str, status: str, error: Optional[str] = None) -> bool:
+        """
+        Update the status of a stored scan
+        
+        Args:
+            scan_id: Scan ID to update
+            status: New status (queued, running, completed, failed)
+            error: Optional error message for failed scans
+            
+        Returns:
+            bool: True if updated successfully
+        """
+        try:
+            update = {'status': status, 'updated_at': datetime.utcnow()}
+            if error:
+                update['error'] = error
+            
+            previous = self.scans_collection.find_one_and_update(
+                {'scan_id': scan_id},
+                {'$set': update},
+                projection=self._ROLLUP_PROJECTION
+            )
+            if previous is None:
+                return False
+            
+            # Only completed scans are counted, so a scan entering or leaving
+            # that status moves between the rollups and statistics
+            if (previous.get('status') in _COMPLETED_STATUSES) != (status in _COMPLETED_STATUSES):
+                self._apply_rollups([previous], [dict(previous, status=status)])
+                self._invalidate_aggregations()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error updating status for scan {scan_id}: {e}")
+            return False
+    
+    def touch_scans(self, scan_ids: Iterable[str]) -> None:
+        """
+        Record that queued or running scans are still being worked on
+        
+        Args:
+            scan_ids: IDs of the scans this process has queued or is running
+        """
+        scan_ids = list(scan_ids)
+        if not scan_ids:
+            return
+        
+        try:
+            self.scans_collection.update_many(
+                {'scan_id': {'$in': scan_ids}, 'status': {'$in': ['queued', 'running']}},
+                {'$set': {'updated_at': datetime.utcnow()}}
+            )
+            
+        except Exception as e:
+            logger.error(f"Error touching scans: {e}")
+    
+    def fail_stale_scans(self, max_age: float, error: str) -> int:
+        """
+        Mark queued or running scans that stopped being touched as failed
+        
+        Args:
+            max_age: Seconds since the last update after which a scan is abandoned
+            error: Error message recorded on each abandoned scan
+            
+        Returns:
+            int: Number of scans marked as failed
+        """
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+            # Neither status is counted in the rollups, so they need no update
+            result = self.scans_collection.update_many(
+                {
+                    'status': {'$in': ['queued', 'running']},
+                    '$or': [
+                        {'updated_at': {'$lt': cutoff}},
+                        # Scans saved before updated_at existed fall back to created_at
+                        {'updated_at': {'$exists': False}, 'created_at': {'$lt': cutoff}}
+                    ]
+                },
+                {'$set': {'status': 'failed', 'error': error, 'updated_at': datetime.utcnow()}}
+            )
+            return result.modified_count
+            
+        except Exception as e:
+            logger.error(f"Error failing stale scans: {e}")
+            return 0
+    
+    def update_email_status(self, scan_id: str, email_status: str) -> bool:
+        """
+        Record the delivery status of a scan's report email
+        
+        Args:
+            scan_id: Scan ID to update
+            email_status: Delivery status (pending, sent, failed)
+            
+        Returns:
+            bool: True if updated successfully
+        """
+        try:
+            result = self.scans_collection.update_one(
+                {'scan_id': scan_id},
+                {'$set': {'email_status': email_status}}
+            )
+            return result.matched_count > 0
+            
+        except Exception as e:
+            logger.error(f"Error updating email status for scan {scan_id}: {e}")
             return False
     
     def _create_results_summary(self, results: Dict) -> Dict:
         """Create a summary of scan results"""
-        summary = {
-            'total_categories': len(results),
-            'categories_checked': []
-        }
+        categories_checked = []
+        append = categories_checked.append
         
         for category, category_results in results.items():
-            if isinstance(category_results, dict):
-                category_info = {
-                    'name': category,
-                    'score': category_results.get('score', 0)
-                }
-                
-                # Count issues/vulnerabilities
-                if 'issues' in category_results:
-                    category_info['issues_count'] = len(category_results['issues'])
-                if 'vulnerabilities' in category_results:
-                    category_info['vulnerabilities_count'] = len(category_results['vulnerabilities'])
-                if 'open_ports' in category_results:
-                    category_info['open_ports_count'] = len(category_results['open_ports'])
-                if 'missing_headers' in category_results:
-                    category_info['missing_headers_count'] = len(category_results['missing_headers'])
-                
-                summary['categories_checked'].append(category_info)
+            if not isinstance(category_results, dict):
+                continue
+            
+            get = category_results.get
+            category_info = {'name': category, 'score': get('score', 0)}
+            
+            # Count issues/vulnerabilities
+            for field, count_key in _SUMMARY_COUNT_FIELDS:
+                items = get(field)
+                if items is not None:
+                    category_info[count_key] = len(items)
+            
+            append(category_info)
         
-        return summary
+        return {
+            'total_categories': len(results),
+            'categories_checked': categories_checked
+        }
     
     def get_scan(self, scan_id: str) -> Optional[Dict]:
         """
@@ -170,11 +593,39 @@ class MongoDBStorage:
                 {'scan_id': scan_id},
                 {'_id': 0}  # Exclude MongoDB _id field
             )
+            
+            # Scans saved before results were split out still carry them inline
+            if scan is not None and 'full_results' not in scan:
+                stored = self.results_collection.find_one(
+                    {'scan_id': scan_id},
+                    {'_id': 0, 'payload': 1}
+                )
+                scan['full_results'] = self._decode_payload(stored['payload']) if stored else {}
+            
             return scan
         except Exception as e:
             logger.error(f"Error getting scan {scan_id}: {e}")
             return None
     
+    def get_scan_metadata_only(self, scan_id: str) -> Optional[Dict]:
+        """
+        Get scan metadata by ID without loading its full results
+        
+        Args:
+            scan_id: Scan ID to retrieve
+            
+        Returns:
+            Dict or None: Scan metadata if found
+        """
+        try:
+            return self.scans_collection.find_one(
+                {'scan_id': scan_id},
+                {'_id': 0, 'full_results': 0}
+            )
+        except Exception as e:
+            logger.error(f"Error getting scan {scan_id}: {e}")
+            return None
+    
     def get_all_scans(self, limit: int = 100, offset: int = 0) -> List[Dict]:
         """
         Get all scans with pagination
@@ -187,24 +638,64 @@ class MongoDBStorage:
             List of scan metadata (without full results)
         """
         try:
-            cursor = self.scans_collection.find(
-                {},
-                {
-                    '_id': 0,
-                    'full_results': 0  # Exclude full results to reduce payload
-                }
-            ).sort('start_time', DESCENDING).skip(offset).limit(limit)
-            
-            return list(cursor)
+            return list(self._all_scans_cursor(limit, offset))
             
         except Exception as e:
             logger.error(f"Error getting all scans: {e}")
             return []
     
+    def iter_all_scans(self, limit: int = 100, offset: int = 0) -> Iterator[Dict]:
+        """
+        Yield scans page by page as the cursor receives them
+        
+        Args:
+            limit: Maximum number of scans to yield
+            offset: Number of scans to skip
+            
+        Yields:
+            Scan metadata (without full results)
+        """
+        try:
+            yield from self._all_scans_cursor(limit, offset)
+            
+        except Exception as e:
+            logger.error(f"Error iterating scans: {e}")
+    
+    def _all_scans_cursor(self, limit: int, offset: int):
+        """Cursor over scan metadata, newest first, fetched in page-sized batches"""
+        return self.analytics_collection.find(
+            {},
+            {
+                '_id': 0,
+                'full_results': 0  # Exclude full results to reduce payload
+            }
+        ).sort('start_time', DESCENDING).hint(self.START_TIME_INDEX).skip(offset).limit(limit).batch_size(
+            min(limit, self.MAX_BATCH_SIZE)
+        )
+    
+    def get_all_scans_with_total(self, limit: int = 100, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Get a page of scans together with the total scan count
+        
+        Args:
+            limit: Maximum number of scans to return
+            offset: Number of scans to skip
+            
+        Returns:
+            Tuple of (list of scan metadata without full results, total number of scans)
+        """
+        try:
+            # An indexed page read plus a metadata count; neither touches the rest of the collection
+            return list(self._all_scans_cursor(limit, offset)), self.get_scan_count()
+            
+        except Exception as e:
+            logger.error(f"Error getting all scans: {e}")
+            return [], 0
+    
     def get_scan_count(self) -> int:
-        """Get total number of scans"""
+        """Get total number of scans (from collection metadata, so it may briefly lag large writes)"""
         try:
-            return self.scans_collection.count_documents({})
+            return self.scans_collection.estimated_document_count()
         except Exception as e:
             logger.error(f"Error getting scan count: {e}")
             return 0
@@ -221,10 +712,39 @@ class MongoDBStorage:
             List of matching scans
         """
         try:
-            # Create regex pattern for case-insensitive search
+            projection = {'_id': 0, 'full_results': 0}
+            
+            # A case-sensitive prefix match can walk the scan_id and target indexes
+            prefix_pattern = {'$regex': f'^{re.escape(query)}'}
+            scans = list(self.analytics_collection.find(
+                {
+                    '$or': [
+                        {'scan_id': prefix_pattern},
+                        {'target': prefix_pattern}
+                    ]
+                },
+                projection
+            ).sort('start_time', DESCENDING).limit(limit).batch_size(min(limit, self.MAX_BATCH_SIZE)))
+            if scans:
+                return scans
+            
+            # Plain words can be served by the text index; a phrase search keeps
+            # the match case-insensitive and tied to the whole query
+            if query.strip() and not _REGEX_METACHARACTERS.search(query):
+                escaped = query.replace('"', '')
+                scans = list(self.analytics_collection.find(
+                    {'$text': {'$search': f'"{escaped}"'}},
+                    projection
+                ).sort('start_time', DESCENDING).limit(limit).batch_size(min(limit, self.MAX_BATCH_SIZE)))
+                if scans:
+                    return scans
+            
+            # Regex queries, and partial words the text index cannot match,
+            # fall back to a case-insensitive scan
+            logger.debug(f"Search for {query!r} falling back to a regex collection scan")
             search_pattern = {'$regex': query, '$options': 'i'}
             
-            cursor = self.scans_collection.find(
+            cursor = self.analytics_collection.find(
                 {
                     '$or': [
                         {'scan_id': search_pattern},
@@ -232,11 +752,8 @@ class MongoDBStorage:
                         {'risk_level': search_pattern}
                     ]
                 },
-                {
-                    '_id': 0,
-                    'full_results': 0
-                }
-            ).sort('start_time', DESCENDING).limit(limit)
+                projection
+            ).sort('start_time', DESCENDING).limit(limit).batch_size(min(limit, self.MAX_BATCH_SIZE))
             
             return list(cursor)
             
@@ -255,9 +772,15 @@ class MongoDBStorage:
             bool: True if deleted successfully
         """
         try:
-            result = self.scans_collection.delete_one({'scan_id': scan_id})
+            deleted = self.scans_collection.find_one_and_delete(
+                {'scan_id': scan_id},
+                projection=self._ROLLUP_PROJECTION
+            )
+            self.results_collection.delete_one({'scan_id': scan_id})
             
-            if result.deleted_count > 0:
+            if deleted is not None:
+                self._apply_rollups([deleted], [])
+                self._invalidate_aggregations()
                 logger.info(f"Deleted scan {scan_id}")
                 return True
             
@@ -267,10 +790,24 @@ class MongoDBStorage:
             logger.error(f"Error deleting scan {scan_id}: {e}")
             return False
     
+    @_cached_aggregation
     def get_statistics(self) -> Dict:
         """Get overall statistics about scans"""
         try:
-            total_scans = self.scans_collection.count_documents({})
+            # One pass over the collection computes every figure
+            pipeline = [
+                # Queued, running and failed scans have no score yet
+                {'$match': _COMPLETED_FILTER},
+                {'$project': {'_id': 0, 'security_score': 1, 'risk_level': 1, 'scan_type': 1}},
+                {'$facet': {
+                    'total': [{'$count': 'count'}],
+                    'average': [{'$group': {'_id': None, 'avg_score': {'$avg': '$security_score'}}}],
+                    'risk_levels': [{'$sortByCount': '$risk_level'}],
+                    'scan_types': [{'$sortByCount': '$scan_type'}]
+                }}
+            ]
+            result = next(self.analytics_collection.aggregate(pipeline))
+            total_scans = result['total'][0]['count'] if result['total'] else 0
             
             if total_scans == 0:
                 return {
@@ -280,45 +817,9 @@ class MongoDBStorage:
                     'scan_type_distribution': {}
                 }
             
-            # Calculate average score
-            pipeline = [
-                {
-                    '$group': {
-                        '_id': None,
-                        'avg_score': {'$avg': '$security_score'}
-                    }
-                }
-            ]
-            avg_result = list(self.scans_collection.aggregate(pipeline))
-            avg_score = avg_result[0]['avg_score'] if avg_result else 0
-            
-            # Risk level distribution
-            risk_pipeline = [
-                {
-                    '$group': {
-                        '_id': '$risk_level',
-                        'count': {'$sum': 1}
-                    }
-                }
-            ]
-            risk_dist = {
-                item['_id']: item['count']
-                for item in self.scans_collection.aggregate(risk_pipeline)
-            }
-            
-            # Scan type distribution
-            type_pipeline = [
-                {
-                    '$group': {
-                        '_id': '$scan_type',
-                        'count': {'$sum': 1}
-                    }
-                }
-            ]
-            type_dist = {
-                item['_id']: item['count']
-                for item in self.scans_collection.aggregate(type_pipeline)
-            }
+            avg_score = result['average'][0]['avg_score'] or 0
+            risk_dist = {item['_id']: item['count'] for item in result['risk_levels']}
+            type_dist = {item['_id']: item['count'] for item in result['scan_types']}
             
             return {
                 'total_scans': total_scans,
@@ -343,13 +844,15 @@ class MongoDBStorage:
             List of scans for the target, sorted by date (newest first)
         """
         try:
-            cursor = self.scans_collection.find(
+            cursor = self.analytics_collection.find(
                 {'target': target},
                 {
                     '_id': 0,
                     'full_results': 0
                 }
-            ).sort('start_time', DESCENDING).limit(limit)
+            ).sort('start_time', DESCENDING).hint(self.TARGET_START_TIME_INDEX).limit(limit).batch_size(
+                min(limit, self.MAX_BATCH_SIZE)
+            )
             
             return list(cursor)
             
@@ -357,6 +860,7 @@ class MongoDBStorage:
             logger.error(f"Error getting target history: {e}")
             return []
     
+    @_cached_aggregation
     def get_trend_data(self, days: int = 30) -> Dict:
         """
         Get trend data for the specified number of days
@@ -368,75 +872,39 @@ class MongoDBStorage:
             Dict with trend information
         """
         try:
-            start_date = datetime.utcnow() - timedelta(days=days)
-            
-            # Daily scan counts
-            daily_pipeline = [
-                {
-                    '$match': {
-                        'start_time': {'$gte': start_date.isoformat()}
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': {
-                            '$dateToString': {
-                                'format': '%Y-%m-%d',
-                                'date': {'$dateFromString': {'dateString': '$start_time'}}
-                            }
-                        },
-                        'count': {'$sum': 1},
-                        'avg_score': {'$avg': '$security_score'}
-                    }
-                },
-                {
-                    '$sort': {'_id': 1}
-                }
+            start_day = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+            period = {'date': {'$gte': start_day}, 'count': {'$gt': 0}}
+            
+            # Daily scan counts and risk level trends, from the per-day rollup buckets
+            buckets = self.daily_rollup_collection.with_options(
+                read_preference=ReadPreference.SECONDARY_PREFERRED
+            ).find(period, {'_id': 0}).sort('date', ASCENDING)
+            
+            daily_totals = {}
+            risk_trend_data = []
+            for bucket in buckets:
+                totals = daily_totals.setdefault(bucket['date'], [0, 0])
+                totals[0] += bucket['count']
+                totals[1] += bucket['score_sum']
+                risk_trend_data.append({
+                    '_id': {'date': bucket['date'], 'risk_level': bucket['risk_level']},
+                    'count': bucket['count']
+                })
+            
+            daily_data = [
+                {'_id': day, 'count': count, 'avg_score': score_sum / count}
+                for day, (count, score_sum) in daily_totals.items()
             ]
             
-            daily_data = list(self.scans_collection.aggregate(daily_pipeline))
-            
-            # Risk level trends
-            risk_trend_pipeline = [
-                {
-                    '$match': {
-                        'start_time': {'$gte': start_date.isoformat()}
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': {
-                            'date': {
-                                '$dateToString': {
-                                    'format': '%Y-%m-%d',
-                                    'date': {'$dateFromString': {'dateString': '$start_time'}}
-                                }
-                            },
-                            'risk_level': '$risk_level'
-                        },
-                        'count': {'$sum': 1}
-                    }
-                },
-                {
-                    '$sort': {'_id.date': 1}
-                }
-            ]
-            
-            risk_trend_data = list(self.scans_collection.aggregate(risk_trend_pipeline))
-            
             # Most scanned targets
             top_targets_pipeline = [
-                {
-                    '$match': {
-                        'start_time': {'$gte': start_date.isoformat()}
-                    }
-                },
+                {'$match': period},
                 {
                     '$group': {
                         '_id': '$target',
-                        'scan_count': {'$sum': 1},
-                        'avg_score': {'$avg': '$security_score'},
-                        'last_scan': {'$max': '$start_time'}
+                        'scan_count': {'$sum': '$count'},
+                        'score_sum': {'$sum': '$score_sum'},
+                        'last_scan': {'$max': '$last_scan'}
                     }
                 },
                 {
@@ -444,10 +912,19 @@ class MongoDBStorage:
                 },
                 {
                     '$limit': 10
+                },
+                {
+                    '$project': {
+                        'scan_count': 1,
+                        'avg_score': {'$divide': ['$score_sum', '$scan_count']},
+                        'last_scan': 1
+                    }
                 }
             ]
             
-            top_targets = list(self.scans_collection.aggregate(top_targets_pipeline))
+            top_targets = list(self.target_rollup_collection.with_options(
+                read_preference=ReadPreference.SECONDARY_PREFERRED
+            ).aggregate(top_targets_pipeline))
             
             return {
                 'period_days': days,
@@ -460,50 +937,61 @@ class MongoDBStorage:
             logger.error(f"Error getting trend data: {e}")
             return {}
     
-    def get_score_improvement_trend(self, target: str) -> Dict:
+    def get_score_improvement_trend(self, target: str, include_scans: bool = True) -> Dict:
         """
         Get security score improvement trend for a specific target
         
         Args:
             target: Target URL/IP
+            include_scans: Also return the per-scan score history
             
         Returns:
             Dict with score history
         """
         try:
-            cursor = self.scans_collection.find(
-                {'target': target},
+            # First/latest scores are reduced server-side along the (target, start_time) index
+            pipeline = [
+                {'$match': {'target': target, **_COMPLETED_FILTER}},
+                {'$sort': {'start_time': ASCENDING}},
                 {
-                    '_id': 0,
-                    'scan_id': 1,
-                    'start_time': 1,
-                    'security_score': 1,
-                    'risk_level': 1
+                    '$group': {
+                        '_id': None,
+                        'total_scans': {'$sum': 1},
+                        'first_score': {'$first': '$security_score'},
+                        'latest_score': {'$last': '$security_score'}
+                    }
                 }
-            ).sort('start_time', ASCENDING)
-            
-            scans = list(cursor)
+            ]
+            summary = next(
+                self.analytics_collection.aggregate(pipeline, hint=self.TARGET_START_TIME_INDEX),
+                None
+            )
             
-            if not scans:
+            if summary is None:
                 return {'target': target, 'scans': []}
             
-            # Calculate improvement
-            if len(scans) > 1:
-                first_score = scans[0]['security_score']
-                last_score = scans[-1]['security_score']
-                improvement = last_score - first_score
-            else:
-                improvement = 0
-            
-            return {
+            result = {
                 'target': target,
-                'total_scans': len(scans),
-                'first_score': scans[0]['security_score'],
-                'latest_score': scans[-1]['security_score'],
-                'improvement': round(improvement, 2),
-                'scans': scans
+                'total_scans': summary['total_scans'],
+                'first_score': summary['first_score'],
+                'latest_score': summary['latest_score'],
+                'improvement': round(summary['latest_score'] - summary['first_score'], 2)
             }
             
+            if include_scans:
+                result['scans'] = list(self.analytics_collection.find(
+                    {'target': target, **_COMPLETED_FILTER},
+                    {
+                        '_id': 0,
+                        'scan_id': 1,
+                        'start_time': 1,
+                        'security_score': 1,
+                        'risk_level': 1
+                    }
+                ).sort('start_time', ASCENDING).hint(self.TARGET_START_TIME_INDEX).batch_size(self.MAX_BATCH_SIZE))
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Error getting score improvement: {e}")
             return {}
@@ -4,15 +4,29 @@ Integrates with Safaricom Daraja API for STK Push payments
 """
 
 import os
+import re
 import logging
 import requests
 import base64
-from datetime import datetime
-from typing import Dict, Optional
-import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Access tokens shared by every MPesaPayment using the same credentials, keyed by
+# (environment, consumer key, SHA-256 of the consumer secret) -> (token, expiry)
+_TOKEN_CACHE: Dict[Tuple[str, str, str], Tuple[str, datetime]] = {}
+_TOKEN_CACHE_LOCK = threading.RLock()
+# Token cache keys with a background refresh in progress (guarded by _TOKEN_CACHE_LOCK)
+_REFRESHING_TOKENS: Set[Tuple[str, str, str]] = set()
+
+# Local (0...), international (+254... / 254...) or bare subscriber number
+_PHONE_REGEX = re.compile(r'^(?:\+?254|0)?(\d+)$')
+
 
 class MPesaPayment:
     """M-Pesa Daraja API integration for payments"""
@@ -21,14 +35,21 @@ class MPesaPayment:
     SANDBOX_BASE_URL = 'https://sandbox.safaricom.co.ke'
     PRODUCTION_BASE_URL = 'https://api.safaricom.co.ke'
     
-    def __init__(self, environment='sandbox'):
+    # Seconds before expiry that a request triggers a background refresh of the token
+    TOKEN_REFRESH_BUFFER = 300
+    # Seconds before expiry that a request stops using the token and refreshes inline
+    TOKEN_EXPIRY_MARGIN = 60
+    
+    def __init__(self, environment='sandbox', session: Optional[requests.Session] = None):
         """
         Initialize M-Pesa payment handler
         
         Args:
             environment: 'sandbox' or 'production'
+            session: Shared HTTP session (connection pool); a new one is created if omitted
         """
         self.environment = environment
+        self.session = session or requests.Session()
         self.base_url = self.SANDBOX_BASE_URL if environment == 'sandbox' else self.PRODUCTION_BASE_URL
         
         # Load credentials from environment
@@ -38,53 +59,102 @@ class MPesaPayment:
         self.passkey = os.getenv('MPESA_PASSKEY')
         self.callback_url = os.getenv('MPESA_CALLBACK_URL', 'https://cybertech-security-scanner.fly.dev/api/payment/callback')
         
-        self.access_token = None
-        self.token_expiry = None
+        # Constant over the process lifetime, so encoded once
+        self._basic_auth_header = 'Basic ' + base64.b64encode(
+            f"{self.consumer_key}:{self.consumer_secret}".encode('ascii')
+        ).decode('ascii')
+        self._shortcode_passkey = f"{self.business_short_code}{self.passkey}".encode('ascii')
+        
+        self._token_key = (
+            self.environment,
+            self.consumer_key or '',
+            hashlib.sha256((self.consumer_secret or '').encode('utf-8')).hexdigest()
+        )
+    
+    def _cached_token(self) -> Optional[str]:
+        """The shared token for these credentials, if valid for at least TOKEN_EXPIRY_MARGIN more seconds"""
+        entry = _TOKEN_CACHE.get(self._token_key)
+        if entry and datetime.now() + timedelta(seconds=self.TOKEN_EXPIRY_MARGIN) < entry[1]:
+            return entry[0]
+        return None
+    
+    def _token_expires_within(self, seconds: float) -> bool:
+        """True if there is no shared token for these credentials or it expires within `seconds`"""
+        entry = _TOKEN_CACHE.get(self._token_key)
+        return entry is None or datetime.now() + timedelta(seconds=seconds) >= entry[1]
         
     def _get_access_token(self) -> Optional[str]:
         """
         Get OAuth access token from Daraja API
         
+        A token close to expiry is still returned while a replacement is
+        fetched in the background, so payment requests rarely wait on OAuth.
+        
         Returns:
             Access token string or None
         """
+        token = self._cached_token()
+        if token:
+            if self._token_expires_within(self.TOKEN_REFRESH_BUFFER):
+                self._start_token_refresh()
+            return token
+        
+        # Only one thread fetches; the others wait and reuse its token
+        with _TOKEN_CACHE_LOCK:
+            token = self._cached_token()
+            if token:
+                return token
+            return self._fetch_access_token()
+    
+    def _fetch_access_token(self) -> Optional[str]:
+        """Request a new access token and cache it until shortly before it expires"""
         try:
-            # Check if we have a valid token
-            if self.access_token and self.token_expiry:
-                if datetime.now() < self.token_expiry:
-                    return self.access_token
-            
             # Generate new token
             auth_url = f"{self.base_url}/oauth/v1/generate?grant_type=client_credentials"
             
-            # Create basic auth header
-            auth_string = f"{self.consumer_key}:{self.consumer_secret}"
-            auth_bytes = auth_string.encode('ascii')
-            base64_bytes = base64.b64encode(auth_bytes)
-            base64_string = base64_bytes.decode('ascii')
-            
             headers = {
-                'Authorization': f'Basic {base64_string}',
+                'Authorization': self._basic_auth_header,
                 'Content-Type': 'application/json'
             }
             
-            response = requests.get(auth_url, headers=headers)
+            response = self.session.get(auth_url, headers=headers, timeout=30)
             response.raise_for_status()
             
-            data = response.json()
-            self.access_token = data.get('access_token')
+            data = orjson.loads(response.content)
+            access_token = data.get('access_token')
             
-            # Token expires in 3600 seconds (1 hour)
-            from datetime import timedelta
-            self.token_expiry = datetime.now() + timedelta(seconds=3500)
+            # Tokens are normally valid for 3599 seconds
+            expires_in = int(data.get('expires_in') or 3599)
+            _TOKEN_CACHE[self._token_key] = (access_token, datetime.now() + timedelta(seconds=expires_in))
             
             logger.info("M-Pesa access token obtained successfully")
-            return self.access_token
+            return access_token
             
         except Exception as e:
             logger.error(f"Failed to get M-Pesa access token: {str(e)}")
             return None
     
+    def _start_token_refresh(self):
+        """Fetch a new token in the background, unless a refresh for these credentials is already running"""
+        with _TOKEN_CACHE_LOCK:
+            if self._token_key in _REFRESHING_TOKENS or not self._token_expires_within(self.TOKEN_REFRESH_BUFFER):
+                return
+            _REFRESHING_TOKENS.add(self._token_key)
+        
+        threading.Thread(target=self._refresh_token, name='mpesa-token-refresh', daemon=True).start()
+    
+    def _refresh_token(self):
+        """Background token fetch started by _start_token_refresh()"""
+        try:
+            self._fetch_access_token()
+        finally:
+            with _TOKEN_CACHE_LOCK:
+                _REFRESHING_TOKENS.discard(self._token_key)
+    
+    def _stk_password(self, timestamp: str) -> str:
+        """Daraja request password: base64 of shortcode + passkey + timestamp"""
+        return base64.b64encode(self._shortcode_passkey + timestamp.encode('ascii')).decode('ascii')
+    
     def initiate_stk_push(self, phone_number: str, amount: int, account_reference: str, 
                           transaction_desc: str = "CyberTech Payment") -> Dict:
         """
@@ -107,21 +177,16 @@ class MPesaPayment:
                     'error': 'Failed to authenticate with M-Pesa'
                 }
             
-            # Format phone number
-            if phone_number.startswith('0'):
-                phone_number = '254' + phone_number[1:]
-            elif phone_number.startswith('+254'):
-                phone_number = phone_number[1:]
-            elif not phone_number.startswith('254'):
-                phone_number = '254' + phone_number
+            # Format phone number as 254XXXXXXXXX
+            match = _PHONE_REGEX.match(phone_number)
+            if match:
+                phone_number = '254' + match.group(1)
             
             # Generate timestamp
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
             
             # Generate password
-            password_string = f"{self.business_short_code}{self.passkey}{timestamp}"
-            password_bytes = password_string.encode('ascii')
-            password_base64 = base64.b64encode(password_bytes).decode('ascii')
+            password_base64 = self._stk_password(timestamp)
             
             # STK Push URL
             stk_url = f"{self.base_url}/mpesa/stkpush/v1/processrequest"
@@ -147,10 +212,10 @@ class MPesaPayment:
             
             logger.info(f"Initiating STK push for {phone_number}, Amount: {amount} KSH")
             
-            response = requests.post(stk_url, json=payload, headers=headers, timeout=30)
+            response = self.session.post(stk_url, data=orjson.dumps(payload), headers=headers, timeout=30)
             response.raise_for_status()
             
-            result = response.json()
+            result = orjson.loads(response.content)
             
             if result.get('ResponseCode') == '0':
                 return {
@@ -201,9 +266,7 @@ class MPesaPayment:
             
             # Generate timestamp and password
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            password_string = f"{self.business_short_code}{self.passkey}{timestamp}"
-            password_bytes = password_string.encode('ascii')
-            password_base64 = base64.b64encode(password_bytes).decode('ascii')
+            password_base64 = self._stk_password(timestamp)
             
             # Query URL
             query_url = f"{self.base_url}/mpesa/stkpushquery/v1/query"
@@ -220,10 +283,10 @@ class MPesaPayment:
                 'CheckoutRequestID': checkout_request_id
             }
             
-            response = requests.post(query_url, json=payload, headers=headers, timeout=30)
+            response = self.session.post(query_url, data=orjson.dumps(payload), headers=headers, timeout=30)
             response.raise_for_status()
             
-            result = response.json()
+            result = orjson.loads(response.content)
             
             return {
                 'success': True,
@@ -239,6 +302,28 @@ class MPesaPayment:
                 'error': str(e)
             }
     
+    def query_transaction_statuses(self, checkout_request_ids: Iterable[str], max_workers: int = 8) -> Dict[str, Dict]:
+        """
+        Query the status of several STK Push transactions concurrently
+        
+        Args:
+            checkout_request_ids: CheckoutRequestIDs from STK push responses
+            max_workers: Maximum number of queries in flight at once
+            
+        Returns:
+            Dict mapping each CheckoutRequestID to its query_transaction_status() result
+        """
+        checkout_request_ids = list(dict.fromkeys(checkout_request_ids))
+        if not checkout_request_ids:
+            return {}
+        
+        # Fetch the token up front so the concurrent queries all reuse it
+        self._get_access_token()
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(checkout_request_ids))) as executor:
+            results = executor.map(self.query_transaction_status, checkout_request_ids)
+            return dict(zip(checkout_request_ids, results))
+    
     def validate_callback(self, callback_data: Dict) -> Dict:
         """
         Validate and parse M-Pesa callback data
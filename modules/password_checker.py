@@ -7,20 +7,62 @@ import requests
 import hashlib
 import logging
 import re
+import threading
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# HIBP range responses by hash prefix. Common passwords cluster on a few prefixes,
+# and a range changes rarely, so a day-old answer is still good.
+_hibp_ranges = TTLCache(maxsize=256, ttl=86400)
+_hibp_ranges_lock = threading.Lock()
+
+# Last fetched copy of each target page with its validators, for conditional GETs:
+# url -> (ETag, Last-Modified, HTML). Bounded by the total bytes of HTML held,
+# since every worker process keeps its own copy.
+PAGE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Each entry is charged 1 KB on top of its HTML for the URL, validators and bookkeeping
+_page_cache = TTLCache(maxsize=PAGE_CACHE_MAX_BYTES, ttl=3600, getsizeof=lambda entry: len(entry[2]) + 1024)
+_page_cache_lock = threading.Lock()
+# Larger pages are not kept in the page cache
+MAX_CACHED_PAGE_SIZE = 512 * 1024
+
+# Score deducted per password security issue; any other severity costs 5
+_SEVERITY_PENALTY = {'critical': 30, 'high': 20, 'medium': 10, 'low': 5}
+
 
 class PasswordChecker:
     """Password security checker"""
     
     HIBP_API = "https://api.pwnedpasswords.com/range/"
     
+    # Password policy keywords, reported in this order
+    POLICY_KEYWORDS = (
+        'password must',
+        'minimum length',
+        'at least',
+        'uppercase',
+        'lowercase',
+        'special character',
+        'number',
+        'digit'
+    )
+    # All policy keywords, found in one case-insensitive pass over the raw page bytes
+    _POLICY_REGEX = re.compile(
+        b'|'.join(re.escape(keyword.encode('ascii')) for keyword in POLICY_KEYWORDS),
+        re.IGNORECASE
+    )
+    
+    # Common patterns of password visibility toggles
+    _TOGGLE_REGEX = re.compile(rb'show password|hide password|toggle password|eye icon', re.IGNORECASE)
+    
     def __init__(self, target, timeout=10):
         self.target = target
         self.timeout = timeout
+        # One session so repeat requests to the target and HIBP reuse pooled connections
+        self.session = requests.Session()
         
     def check(self):
         """Perform password security checks"""
@@ -33,8 +75,12 @@ class PasswordChecker:
         }
         
         try:
+            # Fetch the page once for all of the checks below (raw bytes: the
+            # keyword searches need no decoding and lxml detects the charset itself)
+            html = self._fetch_page()
+            
             # Check for password fields
-            password_fields = self._find_password_fields()
+            password_fields = self._find_password_fields(html)
             results['password_fields'] = password_fields
             
             # Check if passwords are transmitted over HTTPS
@@ -47,7 +93,7 @@ class PasswordChecker:
                 })
             
             # Check for password policy indicators
-            policy_check = self._check_password_policy()
+            policy_check = self._check_password_policy(html)
             results['password_policy'] = policy_check
             
             if not policy_check.get('has_policy_indicators'):
@@ -63,7 +109,7 @@ class PasswordChecker:
                 results['security_issues'].extend(autocomplete_issues)
             
             # Check for password visibility toggle
-            if not self._has_password_visibility_toggle(password_fields):
+            if not self._has_password_visibility_toggle(html):
                 results['recommendations'].append({
                     'priority': 'low',
                     'recommendation': 'Add password visibility toggle for better UX'
@@ -81,35 +127,41 @@ class PasswordChecker:
                 'error': str(e),
                 'score': 50
             }
+        
+        finally:
+            # Release the pooled keep-alive connections to the target
+            self.session.close()
     
     def check_breach(self, password):
         """
         Check if password has been breached using Have I Been Pwned API
         Uses k-anonymity model - only sends first 5 chars of hash
         """
+        return self.check_breach_many([password])[0]
+    
+    def check_breach_many(self, passwords):
+        """Check several passwords against Have I Been Pwned; returns results in input order"""
+        return [self._check_password_breach(password) for password in passwords]
+    
+    def _check_password_breach(self, password):
+        """Look up a password's SHA-1 hash in HIBP by its 5-character prefix"""
         try:
-            # Hash the password
-            sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+            # Hash the password (SHA-1 is what HIBP indexes by, not a security primitive here)
+            sha1_hash = hashlib.sha1(password.encode('utf-8'), usedforsecurity=False).hexdigest().upper()
             prefix = sha1_hash[:5]
             suffix = sha1_hash[5:]
             
-            # Query HIBP API
-            response = requests.get(
-                f"{self.HIBP_API}{prefix}",
-                timeout=self.timeout
-            )
+            range_text = self._fetch_hash_range(prefix)
             
-            if response.status_code == 200:
-                # Check if hash suffix is in response
-                hashes = response.text.splitlines()
-                for line in hashes:
-                    hash_suffix, count = line.split(':')
-                    if hash_suffix == suffix:
-                        return {
-                            'breached': True,
-                            'breach_count': int(count),
-                            'severity': 'critical'
-                        }
+            if range_text is not None:
+                # Check if hash suffix is in response ("SUFFIX:COUNT" lines)
+                count = self._find_breach_count(range_text, suffix)
+                if count:
+                    return {
+                        'breached': True,
+                        'breach_count': count,
+                        'severity': 'critical'
+                    }
                 
                 return {
                     'breached': False,
@@ -128,24 +180,94 @@ class PasswordChecker:
                 'breached': None
             }
     
-    def _find_password_fields(self):
-        """Find password input fields on the page"""
+    def _fetch_hash_range(self, prefix):
+        """HIBP range response text for a hash prefix (cached), or None if the API did not answer"""
+        with _hibp_ranges_lock:
+            range_text = _hibp_ranges.get(prefix)
+        if range_text is not None:
+            return range_text
+        
+        # Query HIBP API
+        response = self.session.get(
+            f"{self.HIBP_API}{prefix}",
+            timeout=self.timeout
+        )
+        if response.status_code != 200:
+            return None
+        
+        range_text = response.text
+        with _hibp_ranges_lock:
+            _hibp_ranges[prefix] = range_text
+        return range_text
+    
+    @staticmethod
+    def _find_breach_count(range_text, suffix):
+        """Breach count for a hash suffix in an HIBP range response (0 if absent), found with one scan"""
+        needle = suffix + ':'
+        if range_text.startswith(needle):
+            start = 0
+        else:
+            start = range_text.find('\n' + needle)
+            if start < 0:
+                return 0
+            start += 1
+        
+        end = range_text.find('\n', start)
+        line = range_text[start:end] if end >= 0 else range_text[start:]
+        return int(line[len(needle):])
+    
+    def _fetch_page(self):
+        """Fetch the target page's raw HTML bytes (empty if it cannot be fetched), revalidating a cached copy"""
+        with _page_cache_lock:
+            cached = _page_cache.get(self.target)
+        
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        try:
+            response = self.session.get(self.target, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                return cached[2]
+            
+            html = response.content
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if (etag or last_modified) and len(html) <= MAX_CACHED_PAGE_SIZE:
+                with _page_cache_lock:
+                    _page_cache[self.target] = (etag, last_modified, html)
+            return html
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {self.target}: {str(e)}")
+            return b''
+    
+    def _find_password_fields(self, html):
+        """Find password input fields in the raw page HTML"""
         password_fields = []
+        if not html.strip():
+            return password_fields
         
         try:
-            response = requests.get(self.target, timeout=self.timeout)
-            soup = BeautifulSoup(response.text, 'html.parser')
+            # lxml builds its tree in C, far faster than a BeautifulSoup tree of Python objects
+            document = lxml_html.fromstring(html)
             
             # Find password input fields
-            password_inputs = soup.find_all('input', {'type': 'password'})
+            password_inputs = document.xpath(
+                "//input[translate(@type, 'PASSWORD', 'password')='password']"
+            )
             
             for input_field in password_inputs:
+                form = next(input_field.iterancestors('form'), None)
                 field_info = {
                     'name': input_field.get('name', 'unnamed'),
                     'id': input_field.get('id', ''),
                     'autocomplete': input_field.get('autocomplete', ''),
-                    'required': input_field.has_attr('required'),
-                    'form': input_field.find_parent('form').get('action', '') if input_field.find_parent('form') else ''
+                    'required': 'required' in input_field.attrib,
+                    'form': form.get('action', '') if form is not None else ''
                 }
                 password_fields.append(field_info)
                 
@@ -154,28 +276,16 @@ class PasswordChecker:
         
         return password_fields
     
-    def _check_password_policy(self):
-        """Check for password policy indicators"""
+    def _check_password_policy(self, html):
+        """Check the raw page HTML for password policy indicators"""
         try:
-            response = requests.get(self.target, timeout=self.timeout)
-            
             # Look for password policy keywords
-            policy_keywords = [
-                'password must',
-                'minimum length',
-                'at least',
-                'uppercase',
-                'lowercase',
-                'special character',
-                'number',
-                'digit'
-            ]
-            
-            has_policy = any(keyword in response.text.lower() for keyword in policy_keywords)
+            found = {match.lower().decode('ascii') for match in self._POLICY_REGEX.findall(html)}
+            found_keywords = [kw for kw in self.POLICY_KEYWORDS if kw in found]
             
             return {
-                'has_policy_indicators': has_policy,
-                'found_keywords': [kw for kw in policy_keywords if kw in response.text.lower()]
+                'has_policy_indicators': bool(found_keywords),
+                'found_keywords': found_keywords
             }
             
         except Exception as e:
@@ -199,39 +309,15 @@ class PasswordChecker:
         
         return issues
     
-    def _has_password_visibility_toggle(self, password_fields):
-        """Check if password visibility toggle is present"""
-        try:
-            response = requests.get(self.target, timeout=self.timeout)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Look for common patterns of password visibility toggles
-            toggle_patterns = [
-                'show password',
-                'hide password',
-                'toggle password',
-                'eye icon'
-            ]
-            
-            return any(pattern in response.text.lower() for pattern in toggle_patterns)
-            
-        except:
-            return False
+    def _has_password_visibility_toggle(self, html):
+        """Check the raw page HTML for a password visibility toggle"""
+        return self._TOGGLE_REGEX.search(html) is not None
     
     def _calculate_password_score(self, results):
         """Calculate password security score"""
-        score = 100
-        
-        for issue in results['security_issues']:
-            severity = issue.get('severity', 'low')
-            if severity == 'critical':
-                score -= 30
-            elif severity == 'high':
-                score -= 20
-            elif severity == 'medium':
-                score -= 10
-            else:
-                score -= 5
-        
-        return max(0, score)
+        penalty = sum(
+            _SEVERITY_PENALTY.get(issue.get('severity'), 5)
+            for issue in results['security_issues']
+        )
+        return max(0, 100 - penalty)
 
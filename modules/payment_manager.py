@@ -60,13 +60,21 @@ class PaymentManager:
         Args:
             mongodb_storage: MongoDBStorage instance (optional)
         """
+        self.client = None
         self.db = None
         self.payments_collection = None
         self.subscriptions_collection = None
+        self._mongodb_storage = mongodb_storage
         
+        self._connect(mongodb_storage)
+    
+    def _connect(self, mongodb_storage=None):
+        """Connect to MongoDB (or share the scan storage's client)"""
+        database_name = os.getenv('MONGODB_DB_NAME', 'cybertech')
         try:
             if mongodb_storage:
-                self.db = mongodb_storage.db
+                # Same connection pool, but payments keep their configured database
+                self.db = mongodb_storage.client[database_name]
             else:
                 # Connect to MongoDB with timeout
                 connection_string = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
@@ -78,9 +86,10 @@ class PaymentManager:
                 )
                 # Test connection
                 client.admin.command('ping')
-                self.db = client[os.getenv('MONGODB_DB_NAME', 'cybertech')]
+                self.client = client
+                self.db = client[database_name]
             
-            if self.db:
+            if self.db is not None:
                 self.payments_collection = self.db['payments']
                 self.subscriptions_collection = self.db['subscriptions']
                 self._ensure_indexes()
@@ -90,6 +99,14 @@ class PaymentManager:
             logger.warning("Payment tracking will be disabled. Set MONGODB_URI to enable payments.")
             self.db = None
     
+    def reconnect(self):
+        """Open a fresh MongoDB connection, e.g. in a forked worker process"""
+        if self._mongodb_storage is not None:
+            # Pick up the scan storage's new client (it must reconnect first)
+            self._connect(self._mongodb_storage)
+        elif self.client is not None:
+            self._connect()
+    
     def _ensure_indexes(self):
         """Create necessary indexes"""
         try:
@@ -118,7 +135,7 @@ class PaymentManager:
         Returns:
             bool: True if created successfully
         """
-        if not self.payments_collection:
+        if self.payments_collection is None:
             logger.warning("Payment collection not available. Cannot create payment record.")
             return False
             
@@ -154,7 +171,7 @@ class PaymentManager:
         Returns:
             bool: True if updated successfully
         """
-        if not self.payments_collection:
+        if self.payments_collection is None:
             logger.warning("Payment collection not available")
             return False
             
@@ -277,7 +294,7 @@ class PaymentManager:
         Returns:
             bool: True if has active subscription
         """
-        if not self.subscriptions_collection:
+        if self.subscriptions_collection is None:
             logger.warning("Subscription collection not available")
             return False
             
@@ -304,7 +321,7 @@ class PaymentManager:
         Returns:
             bool: True if has active subscription
         """
-        if not self.subscriptions_collection:
+        if self.subscriptions_collection is None:
             logger.warning("Subscription collection not available")
             return False
             
@@ -358,7 +375,7 @@ class PaymentManager:
         Returns:
             bool: True if paid
         """
-        if not self.payments_collection:
+        if self.payments_collection is None:
             logger.warning("Payment collection not available. Cannot check payment status.")
             return False
             
@@ -392,7 +409,7 @@ class PaymentManager:
         Returns:
             bool: True if paid
         """
-        if not self.payments_collection:
+        if self.payments_collection is None:
             logger.warning("Payment collection not available. Cannot check payment status.")
             return False
             
@@ -6,7 +6,7 @@ International payment processing via Paystack
 import os
 import logging
 import requests
-from typing import Dict
+from typing import Dict, Optional
 import hashlib
 import hmac
 
@@ -18,8 +18,9 @@ class PaystackPayment:
     
     API_URL = 'https://api.paystack.co'
     
-    def __init__(self):
-        """Initialize Paystack payment handler"""
+    def __init__(self, session: Optional[requests.Session] = None):
+        """Initialize Paystack payment handler (session: shared HTTP session, created if omitted)"""
+        self.session = session or requests.Session()
         self.secret_key = os.getenv('PAYSTACK_SECRET_KEY')
         self.public_key = os.getenv('PAYSTACK_PUBLIC_KEY')
         self.webhook_secret = os.getenv('PAYSTACK_WEBHOOK_SECRET')
@@ -73,7 +74,7 @@ class PaystackPayment:
                 'metadata': metadata or {}
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f'{self.API_URL}/transaction/initialize',
                 json=payload,
                 headers=headers,
@@ -127,7 +128,7 @@ class PaystackPayment:
                 'Authorization': f'Bearer {self.secret_key}'
             }
             
-            response = requests.get(
+            response = self.session.get(
                 f'{self.API_URL}/transaction/verify/{reference}',
                 headers=headers,
                 timeout=30
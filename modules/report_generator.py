@@ -3,8 +3,10 @@ Report Generator Module
 Generates PDF and HTML security reports
 """
 
+import io
 import os
 import logging
+import functools
 from datetime import datetime
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -20,59 +22,73 @@ from reportlab.lib.colors import HexColor
 logger = logging.getLogger(__name__)
 
 
+def _add_custom_styles(styles):
+    """Add custom paragraph styles"""
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=HexColor('#1a1a1a'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=HexColor('#2c3e50'),
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    ))
+
+    styles.add(ParagraphStyle(
+        name='Subtitle',
+        parent=styles['Normal'],
+        fontSize=12,
+        textColor=HexColor('#7f8c8d'),
+        alignment=TA_CENTER,
+        spaceAfter=12
+    ))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_styles():
+    """Build the report stylesheet once per process (styles are read-only once built)"""
+    styles = getSampleStyleSheet()
+    _add_custom_styles(styles)
+    return styles
+
+
 class ReportGenerator:
     """Security report generator"""
     
     def __init__(self, scan_results):
         self.scan_results = scan_results
         self.scan_id = scan_results.get('scan_id', 'unknown')
-        
+        self.pdf_bytes = None
+        
+    def generate_pdf_bytes(self):
+        """Render the PDF security report in memory and return its bytes (also kept on self.pdf_bytes)"""
+        buffer = io.BytesIO()
+        self.build_pdf(buffer)
+        self.pdf_bytes = buffer.getvalue()
+        return self.pdf_bytes
+    
     def generate_pdf_report(self):
-        """Generate PDF security report"""
+        """Generate PDF security report (the rendered bytes are kept on self.pdf_bytes for emailing)"""
         try:
             # Create reports directory if it doesn't exist
             os.makedirs('reports', exist_ok=True)
             
             report_path = f'reports/scan_{self.scan_id}.pdf'
             
-            # Create PDF document
-            doc = SimpleDocTemplate(
-                report_path,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=18
-            )
-            
-            # Build report content
-            story = []
-            styles = getSampleStyleSheet()
-            
-            # Add custom styles
-            self._add_custom_styles(styles)
+            self.generate_pdf_bytes()
             
-            # Title Page
-            story.extend(self._create_title_page(styles))
-            story.append(PageBreak())
-            
-            # Executive Summary
-            story.extend(self._create_executive_summary(styles))
-            story.append(Spacer(1, 0.2 * inch))
-            
-            # Security Score
-            story.extend(self._create_security_score_section(styles))
-            story.append(Spacer(1, 0.3 * inch))
-            
-            # Detailed Findings
-            story.extend(self._create_detailed_findings(styles))
-            
-            # Recommendations
-            story.append(PageBreak())
-            story.extend(self._create_recommendations(styles))
-            
-            # Build PDF
-            doc.build(story)
+            with open(report_path, 'wb') as f:
+                f.write(self.pdf_bytes)
             
             logger.info(f"PDF report generated: {report_path}")
             return report_path
@@ -81,36 +97,43 @@ class ReportGenerator:
             logger.error(f"PDF generation error: {str(e)}")
             raise
     
-    def _add_custom_styles(self, styles):
-        """Add custom paragraph styles"""
-        styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        
-        styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=HexColor('#2c3e50'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        ))
-        
-        styles.add(ParagraphStyle(
-            name='Subtitle',
-            parent=styles['Normal'],
-            fontSize=12,
-            textColor=HexColor('#7f8c8d'),
-            alignment=TA_CENTER,
-            spaceAfter=12
-        ))
+    def build_pdf(self, output):
+        """Render the PDF report into output (a file path or writable binary file object)"""
+        # Create PDF document
+        doc = SimpleDocTemplate(
+            output,
+            pagesize=letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=18
+        )
+        
+        # Build report content
+        story = []
+        styles = _load_styles()
+        
+        # Title Page
+        story.extend(self._create_title_page(styles))
+        story.append(PageBreak())
+        
+        # Executive Summary
+        story.extend(self._create_executive_summary(styles))
+        story.append(Spacer(1, 0.2 * inch))
+        
+        # Security Score
+        story.extend(self._create_security_score_section(styles))
+        story.append(Spacer(1, 0.3 * inch))
+        
+        # Detailed Findings
+        story.extend(self._create_detailed_findings(styles))
+        
+        # Recommendations
+        story.append(PageBreak())
+        story.extend(self._create_recommendations(styles))
+        
+        # Build PDF
+        doc.build(story)
     
     def _create_title_page(self, styles):
         """Create title page"""
@@ -6,7 +6,7 @@ Modern email sending using Resend API
 import os
 import logging
 import requests
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -16,15 +16,17 @@ class ResendEmail:
     
     API_URL = 'https://api.resend.com/emails'
     
-    def __init__(self):
-        """Initialize Resend email sender"""
+    def __init__(self, session: Optional[requests.Session] = None):
+        """Initialize Resend email sender (session: shared HTTP session, created if omitted)"""
+        self.session = session or requests.Session()
         self.api_key = os.getenv('RESEND_API_KEY')
         self.from_email = os.getenv('FROM_EMAIL', 'noreply@maishatech.co.ke')
         
         if not self.api_key:
             logger.warning("RESEND_API_KEY not found in environment")
     
-    def send_report(self, recipient: str, report_path: str, scan_results: Dict) -> Dict:
+    def send_report(self, recipient: str, report_path: str, scan_results: Dict,
+                    pdf_content: Optional[bytes] = None) -> Dict:
         """
         Send security report via email
         
@@ -32,6 +34,7 @@ class ResendEmail:
             recipient: Recipient email address
             report_path: Path to PDF report file
             scan_results: Scan results dictionary
+            pdf_content: Already-rendered PDF bytes (skips reading report_path)
             
         Returns:
             Dict with send status
@@ -48,9 +51,10 @@ class ResendEmail:
             security_score = scan_results.get('security_score', 0)
             risk_level = scan_results.get('risk_level', 'UNKNOWN')
             
-            # Read PDF file
-            with open(report_path, 'rb') as f:
-                pdf_content = f.read()
+            # Read PDF file unless the caller already has the bytes
+            if pdf_content is None:
+                with open(report_path, 'rb') as f:
+                    pdf_content = f.read()
             
             # Prepare email
             headers = {
@@ -139,7 +143,7 @@ class ResendEmail:
                 ]
             }
             
-            response = requests.post(self.API_URL, json=payload, headers=headers, timeout=30)
+            response = self.session.post(self.API_URL, json=payload, headers=headers, timeout=30)
             response.raise_for_status()
             
             result = response.json()
@@ -241,7 +245,7 @@ class ResendEmail:
                 'html': html_body
             }
             
-            response = requests.post(self.API_URL, json=payload, headers=headers, timeout=30)
+            response = self.session.post(self.API_URL, json=payload, headers=headers, timeout=30)
             response.raise_for_status()
             
             result = response.json()
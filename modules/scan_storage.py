@@ -4,13 +4,35 @@ Factory for creating storage handlers (JSON or MongoDB)
 """
 
 import os
-import json
+import re
+import time
+import atexit
+import bisect
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional
+import threading
+import orjson
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Result list fields counted in a scan's results summary, with their summary keys
+_SUMMARY_COUNT_FIELDS = (
+    ('issues', 'issues_count'),
+    ('vulnerabilities', 'vulnerabilities_count'),
+    ('open_ports', 'open_ports_count'),
+    ('missing_headers', 'missing_headers_count'),
+)
+
+# Search tokens: runs of letters/digits in scan_id, target and risk_level
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _is_completed(scan: Dict) -> bool:
+    """Whether a scan counts towards statistics and trends (older entries have no status)"""
+    return scan.get('status', 'completed') == 'completed'
+
 
 def get_storage_backend(backend='auto'):
     """
@@ -55,9 +77,23 @@ ScanStorage = get_storage_backend
 class JSONStorage:
     """Storage handler for scan metadata and results"""
     
+    # Seconds between background flushes of saved scans to the JSON file
+    FLUSH_INTERVAL = 0.5
+    
     def __init__(self, storage_path='data/scans.json'):
         self.storage_path = storage_path
+        # Scans are saved from background worker threads, so serialize
+        # read-modify-write cycles on the JSON file
+        self._lock = threading.RLock()
+        # Saved scans waiting to be written, keyed by scan_id in save order
+        self._pending = {}
+        # Pending scans that were already on disk and only had their status updated
+        self._pending_updates = set()
+        self._flusher = None
+        # (file signature, scans, sorted tokens, token -> scan positions)
+        self._search_index = None
         self._ensure_storage_exists()
+        atexit.register(self.flush)
     
     def _ensure_storage_exists(self):
         """Ensure storage directory and file exist"""
@@ -69,10 +105,15 @@ class JSONStorage:
             self._write_data({'scans': []})
     
     def _read_data(self) -> Dict:
-        """Read all data from storage"""
+        """Read all data from storage, writing out pending saves first"""
+        self.flush()
+        return self._read_file()
+    
+    def _read_file(self) -> Dict:
+        """Read the JSON file as it is on disk"""
         try:
-            with open(self.storage_path, 'r') as f:
-                return json.load(f)
+            with open(self.storage_path, 'rb') as f:
+                return orjson.loads(f.read())
         except Exception as e:
             logger.error(f"Error reading storage: {e}")
             return {'scans': []}
@@ -80,8 +121,13 @@ class JSONStorage:
     def _write_data(self, data: Dict):
         """Write data to storage"""
         try:
-            with open(self.storage_path, 'w') as f:
-                json.dump(data, f, indent=2)
+            # Encode the whole file in one call and write the bytes as-is
+            body = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            # Write a temp file and swap it in so readers never see a half-written file
+            tmp_path = f"{self.storage_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, self.storage_path)
         except Exception as e:
             logger.error(f"Error writing storage: {e}")
             raise
@@ -97,8 +143,6 @@ class JSONStorage:
             bool: True if saved successfully
         """
         try:
-            data = self._read_data()
-            
             # Create scan metadata entry
             scan_entry = {
                 'scan_id': scan_results.get('scan_id'),
@@ -111,18 +155,17 @@ class JSONStorage:
                 'duration': scan_results.get('duration', 0),
                 'status': scan_results.get('status', 'completed'),
                 'created_at': datetime.utcnow().isoformat(),
+                'updated_at': datetime.utcnow().isoformat(),
                 'results_summary': self._create_results_summary(scan_results.get('results', {})),
                 'full_results': scan_results  # Store complete results
             }
             
-            # Add to scans list (newest first)
-            data['scans'].insert(0, scan_entry)
-            
-            # Keep only last 1000 scans to prevent file from growing too large
-            if len(data['scans']) > 1000:
-                data['scans'] = data['scans'][:1000]
-            
-            self._write_data(data)
+            with self._lock:
+                # Replace any earlier pending save (e.g. a queued placeholder)
+                self._pending.pop(scan_entry['scan_id'], None)
+                self._pending_updates.discard(scan_entry['scan_id'])
+                self._pending[scan_entry['scan_id']] = scan_entry
+                self._start_flusher()
             logger.info(f"Saved scan {scan_entry['scan_id']} to storage")
             return True
             
@@ -130,33 +173,211 @@ class JSONStorage:
             logger.error(f"Error saving scan: {e}", exc_info=True)
             return False
     
+    def _start_flusher(self):
+        """Start the background flush thread (again after a fork, which drops threads)"""
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(
+                target=self._flush_loop,
+                name='scan-storage-flush',
+                daemon=True
+            )
+            self._flusher.start()
+    
+    def _flush_loop(self):
+        """Write pending saves every FLUSH_INTERVAL seconds"""
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            self.flush()
+    
+    def flush(self):
+        """
+        Write all pending saves to the JSON file in a single read-modify-write
+        
+        Saves are batched so a burst of scans rewrites the file once
+        instead of once per scan. Failed flushes are retried on the next call.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            
+            try:
+                data = self._read_file()
+                
+                # Status updates replace their entry in place (and are dropped if the
+                # scan was deleted meanwhile); saves replace earlier entries and go first
+                scans = []
+                for scan in data['scans']:
+                    scan_id = scan['scan_id']
+                    if scan_id in self._pending_updates:
+                        scans.append(self._pending[scan_id])
+                    elif scan_id not in self._pending:
+                        scans.append(scan)
+                scans[:0] = reversed([
+                    entry for scan_id, entry in self._pending.items()
+                    if scan_id not in self._pending_updates
+                ])
+                data['scans'] = scans
+                
+                # Keep only last 1000 scans to prevent file from growing too large
+                if len(data['scans']) > 1000:
+                    data['scans'] = data['scans'][:1000]
+                
+                self._write_data(data)
+                logger.debug(f"Flushed {len(self._pending)} scan(s) to storage")
+                self._pending.clear()
+                self._pending_updates.clear()
+            except Exception as e:
+                logger.error(f"Error flushing scans to storage: {e}", exc_info=True)
+    
+    def _pending_entry(self, scan_id: str) -> Optional[Dict]:
+        """
+        Get the pending entry for a scan so it can be updated in the next flush
+        
+        A scan that is already on disk is copied into the pending batch, so
+        status updates are written with the other pending saves instead of
+        rewriting the file each time. Call with self._lock held.
+        
+        Args:
+            scan_id: Scan ID to look up
+            
+        Returns:
+            The pending scan entry, or None if the scan does not exist
+        """
+        pending = self._pending.get(scan_id)
+        if pending is not None:
+            return pending
+        
+        for scan in self._read_file()['scans']:
+            if scan['scan_id'] == scan_id:
+                self._pending[scan_id] = scan
+                self._pending_updates.add(scan_id)
+                self._start_flusher()
+                return scan
+        return None
+    
+    def update_scan_status(self, scan_id: str, status: str, error: Optional[str] = None) -> bool:
+        """
+        Update the status of a stored scan
+        
+        Args:
+            scan_id: Scan ID to update
+            status: New status (queued, running, completed, failed)
+            error: Optional error message for failed scans
+            
+        Returns:
+            bool: True if updated successfully
+        """
+        try:
+            with self._lock:
+                pending = self._pending_entry(scan_id)
+                if pending is None:
+                    return False
+                
+                pending['status'] = status
+                pending['updated_at'] = datetime.utcnow().isoformat()
+                if error:
+                    pending['error'] = error
+            return True
+        except Exception as e:
+            logger.error(f"Error updating status for scan {scan_id}: {e}")
+            return False
+    
+    def update_email_status(self, scan_id: str, email_status: str) -> bool:
+        """
+        Record the delivery status of a scan's report email
+        
+        Args:
+            scan_id: Scan ID to update
+            email_status: Delivery status (pending, sent, failed)
+            
+        Returns:
+            bool: True if updated successfully
+        """
+        try:
+            with self._lock:
+                pending = self._pending_entry(scan_id)
+                if pending is None:
+                    return False
+                
+                pending['email_status'] = email_status
+            return True
+        except Exception as e:
+            logger.error(f"Error updating email status for scan {scan_id}: {e}")
+            return False
+    
+    def touch_scans(self, scan_ids: Iterable[str]) -> None:
+        """
+        Record that queued or running scans are still being worked on
+        
+        Args:
+            scan_ids: IDs of the scans this process has queued or is running
+        """
+        try:
+            now = datetime.utcnow().isoformat()
+            with self._lock:
+                for scan_id in scan_ids:
+                    pending = self._pending_entry(scan_id)
+                    if pending is not None and pending.get('status') in ('queued', 'running'):
+                        pending['updated_at'] = now
+        except Exception as e:
+            logger.error(f"Error touching scans: {e}")
+    
+    def fail_stale_scans(self, max_age: float, error: str) -> int:
+        """
+        Mark queued or running scans that stopped being touched as failed
+        
+        Args:
+            max_age: Seconds since the last update after which a scan is abandoned
+            error: Error message recorded on each abandoned scan
+            
+        Returns:
+            int: Number of scans marked as failed
+        """
+        try:
+            cutoff = (datetime.utcnow() - timedelta(seconds=max_age)).isoformat()
+            with self._lock:
+                data = self._read_data()
+                stale = 0
+                for scan in data['scans']:
+                    # Entries written before updated_at existed fall back to created_at
+                    last_update = scan.get('updated_at') or scan.get('created_at') or ''
+                    if scan.get('status') in ('queued', 'running') and last_update < cutoff:
+                        scan['status'] = 'failed'
+                        scan['error'] = error
+                        scan['updated_at'] = datetime.utcnow().isoformat()
+                        stale += 1
+                
+                if stale:
+                    self._write_data(data)
+            return stale
+        except Exception as e:
+            logger.error(f"Error failing stale scans: {e}")
+            return 0
+    
     def _create_results_summary(self, results: Dict) -> Dict:
         """Create a summary of scan results"""
-        summary = {
-            'total_categories': len(results),
-            'categories_checked': []
-        }
+        categories_checked = []
+        append = categories_checked.append
         
         for category, category_results in results.items():
-            if isinstance(category_results, dict):
-                category_info = {
-                    'name': category,
-                    'score': category_results.get('score', 0)
-                }
-                
-                # Count issues/vulnerabilities
-                if 'issues' in category_results:
-                    category_info['issues_count'] = len(category_results['issues'])
-                if 'vulnerabilities' in category_results:
-                    category_info['vulnerabilities_count'] = len(category_results['vulnerabilities'])
-                if 'open_ports' in category_results:
-                    category_info['open_ports_count'] = len(category_results['open_ports'])
-                if 'missing_headers' in category_results:
-                    category_info['missing_headers_count'] = len(category_results['missing_headers'])
-                
-                summary['categories_checked'].append(category_info)
+            if not isinstance(category_results, dict):
+                continue
+            
+            get = category_results.get
+            category_info = {'name': category, 'score': get('score', 0)}
+            
+            # Count issues/vulnerabilities
+            for field, count_key in _SUMMARY_COUNT_FIELDS:
+                items = get(field)
+                if items is not None:
+                    category_info[count_key] = len(items)
+            
+            append(category_info)
         
-        return summary
+        return {
+            'total_categories': len(results),
+            'categories_checked': categories_checked
+        }
     
     def get_scan(self, scan_id: str) -> Optional[Dict]:
         """
@@ -169,7 +390,12 @@ class JSONStorage:
             Dict or None: Scan data if found
         """
         try:
-            data = self._read_data()
+            with self._lock:
+                pending = self._pending.get(scan_id)
+            if pending is not None:
+                return pending
+            
+            data = self._read_file()
             for scan in data['scans']:
                 if scan['scan_id'] == scan_id:
                     return scan
@@ -178,6 +404,21 @@ class JSONStorage:
             logger.error(f"Error getting scan {scan_id}: {e}")
             return None
     
+    def get_scan_metadata_only(self, scan_id: str) -> Optional[Dict]:
+        """
+        Get scan metadata by ID without its full results
+        
+        Args:
+            scan_id: Scan ID to retrieve
+            
+        Returns:
+            Dict or None: Scan metadata if found
+        """
+        scan = self.get_scan(scan_id)
+        if scan is None:
+            return None
+        return {key: value for key, value in scan.items() if key != 'full_results'}
+    
     def get_all_scans(self, limit: int = 100, offset: int = 0) -> List[Dict]:
         """
         Get all scans with pagination
@@ -189,30 +430,45 @@ class JSONStorage:
         Returns:
             List of scan metadata (without full results)
         """
+        return self.get_all_scans_with_total(limit=limit, offset=offset)[0]
+    
+    def get_all_scans_with_total(self, limit: int = 100, offset: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Get a page of scans together with the total scan count, from one file read
+        
+        Args:
+            limit: Maximum number of scans to return
+            offset: Number of scans to skip
+            
+        Returns:
+            Tuple of (list of scan metadata without full results, total number of scans)
+        """
         try:
             data = self._read_data()
             scans = data['scans'][offset:offset + limit]
             
             # Return scans without full_results to reduce payload size
-            return [
-                {
-                    'scan_id': scan['scan_id'],
-                    'target': scan['target'],
-                    'scan_type': scan['scan_type'],
-                    'security_score': scan['security_score'],
-                    'risk_level': scan['risk_level'],
-                    'start_time': scan['start_time'],
-                    'end_time': scan['end_time'],
-                    'duration': scan['duration'],
-                    'status': scan['status'],
-                    'created_at': scan['created_at'],
-                    'results_summary': scan.get('results_summary', {})
-                }
-                for scan in scans
-            ]
+            return [self._scan_metadata(scan) for scan in scans], len(data['scans'])
         except Exception as e:
             logger.error(f"Error getting all scans: {e}")
-            return []
+            return [], 0
+    
+    @staticmethod
+    def _scan_metadata(scan: Dict) -> Dict:
+        """Scan entry without its full results"""
+        return {
+            'scan_id': scan['scan_id'],
+            'target': scan['target'],
+            'scan_type': scan['scan_type'],
+            'security_score': scan['security_score'],
+            'risk_level': scan['risk_level'],
+            'start_time': scan['start_time'],
+            'end_time': scan['end_time'],
+            'duration': scan['duration'],
+            'status': scan['status'],
+            'created_at': scan['created_at'],
+            'results_summary': scan.get('results_summary', {})
+        }
     
     def get_scan_count(self) -> int:
         """Get total number of scans"""
@@ -223,10 +479,50 @@ class JSONStorage:
             logger.error(f"Error getting scan count: {e}")
             return 0
     
+    def _get_search_index(self):
+        """
+        Return the token index for search, rebuilding it when the file changes
+        
+        The index is keyed on the file's mtime and size so writes from
+        other worker processes are picked up on the next search.
+        
+        Only scan metadata is kept, so the index does not hold on to
+        full results and search hits need no further copying.
+        
+        Returns:
+            Tuple of (entries, sorted token list, token -> set of entry positions),
+            where each entry is (lowercased searchable fields, scan metadata)
+        """
+        self.flush()
+        st = os.stat(self.storage_path)
+        signature = (st.st_mtime_ns, st.st_size)
+        
+        with self._lock:
+            if self._search_index is None or self._search_index[0] != signature:
+                entries = []
+                postings = defaultdict(set)
+                for position, scan in enumerate(self._read_data()['scans']):
+                    fields = tuple(
+                        (scan.get(name) or '').lower()
+                        for name in ('scan_id', 'target', 'risk_level')
+                    )
+                    for field in fields:
+                        for token in _TOKEN_RE.findall(field):
+                            postings[token].add(position)
+                    entries.append((fields, self._scan_metadata(scan)))
+                self._search_index = (signature, entries, sorted(postings), postings)
+            
+            return self._search_index[1:]
+    
     def search_scans(self, query: str, limit: int = 50) -> List[Dict]:
         """
         Search scans by target, scan_id, or other fields
         
+        Each word of the query matches the start of a word in the scan_id,
+        target or risk level, e.g. "exam" finds "www.example.com". Queries the
+        word index cannot answer (mid-word fragments, or no letters or digits)
+        fall back to a substring match over every scan.
+        
         Args:
             query: Search query string
             limit: Maximum results to return
@@ -235,36 +531,52 @@ class JSONStorage:
             List of matching scans
         """
         try:
-            data = self._read_data()
+            entries, tokens, postings = self._get_search_index()
             query_lower = query.lower()
             
+            candidates = None
+            for query_token in _TOKEN_RE.findall(query_lower):
+                # Prefix lookup in the sorted vocabulary
+                matched = set()
+                i = bisect.bisect_left(tokens, query_token)
+                while i < len(tokens) and tokens[i].startswith(query_token):
+                    matched |= postings[tokens[i]]
+                    i += 1
+                
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    break
+            
+            # Positions follow file order, which is newest first
             matching_scans = []
-            for scan in data['scans']:
-                if (query_lower in scan['scan_id'].lower() or
-                    query_lower in scan['target'].lower() or
-                    query_lower in scan.get('risk_level', '').lower()):
-                    matching_scans.append({
-                        'scan_id': scan['scan_id'],
-                        'target': scan['target'],
-                        'scan_type': scan['scan_type'],
-                        'security_score': scan['security_score'],
-                        'risk_level': scan['risk_level'],
-                        'start_time': scan['start_time'],
-                        'end_time': scan['end_time'],
-                        'duration': scan['duration'],
-                        'status': scan['status'],
-                        'created_at': scan['created_at'],
-                        'results_summary': scan.get('results_summary', {})
-                    })
-                    
-                    if len(matching_scans) >= limit:
-                        break
+            if candidates:
+                matching_scans = self._match_entries(entries, sorted(candidates), query_lower, limit)
+            if not matching_scans:
+                matching_scans = self._match_entries(entries, range(len(entries)), query_lower, limit)
             
             return matching_scans
         except Exception as e:
             logger.error(f"Error searching scans: {e}")
             return []
     
+    @staticmethod
+    def _match_entries(entries: List[Tuple], positions: Iterable[int], query_lower: str, limit: int) -> List[Dict]:
+        """Metadata of the search index entries at positions whose fields contain query_lower"""
+        matching_scans = []
+        for position in positions:
+            fields, metadata = entries[position]
+            
+            # Multi-word queries must still match as a phrase in one field
+            if not any(query_lower in field for field in fields):
+                continue
+            
+            matching_scans.append(metadata)
+            
+            if len(matching_scans) >= limit:
+                break
+        
+        return matching_scans
+    
     def delete_scan(self, scan_id: str) -> bool:
         """
         Delete a scan by ID
@@ -276,15 +588,16 @@ class JSONStorage:
             bool: True if deleted successfully
         """
         try:
-            data = self._read_data()
-            original_length = len(data['scans'])
-            
-            data['scans'] = [s for s in data['scans'] if s['scan_id'] != scan_id]
-            
-            if len(data['scans']) < original_length:
-                self._write_data(data)
-                logger.info(f"Deleted scan {scan_id}")
-                return True
+            with self._lock:
+                data = self._read_data()
+                original_length = len(data['scans'])
+                
+                data['scans'] = [s for s in data['scans'] if s['scan_id'] != scan_id]
+                
+                if len(data['scans']) < original_length:
+                    self._write_data(data)
+                    logger.info(f"Deleted scan {scan_id}")
+                    return True
             
             return False
         except Exception as e:
@@ -295,7 +608,8 @@ class JSONStorage:
         """Get overall statistics about scans"""
         try:
             data = self._read_data()
-            scans = data['scans']
+            # Queued, running and failed scans have no score yet
+            scans = [s for s in data['scans'] if _is_completed(s)]
             
             if not scans:
                 return {
@@ -367,36 +681,39 @@ class JSONStorage:
             data = self._read_data()
             scans = data['scans']
             
-            start_date = datetime.utcnow() - timedelta(days=days)
-            
-            # Filter scans within date range
-            recent_scans = [
-                s for s in scans
-                if datetime.fromisoformat(s.get('start_time', '')) >= start_date
-            ]
+            # start_time is stored as an ISO 8601 string, so the range filter
+            # and the day bucket work on the string directly instead of
+            # parsing every timestamp.
+            cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
             
             # Daily scan counts and scores
             daily_data = defaultdict(lambda: {'count': 0, 'total_score': 0})
             risk_trends = defaultdict(lambda: defaultdict(int))
             target_counts = defaultdict(lambda: {'count': 0, 'total_score': 0, 'last_scan': None})
             
-            for scan in recent_scans:
-                scan_date = datetime.fromisoformat(scan['start_time']).strftime('%Y-%m-%d')
+            # Single pass: filter and aggregate together
+            for scan in scans:
+                start_time = scan.get('start_time') or ''
+                if start_time < cutoff or not _is_completed(scan):
+                    continue
+                
+                scan_date = start_time[:10]
+                score = scan.get('security_score') or 0
                 
                 # Daily counts
-                daily_data[scan_date]['count'] += 1
-                daily_data[scan_date]['total_score'] += scan.get('security_score', 0)
+                day = daily_data[scan_date]
+                day['count'] += 1
+                day['total_score'] += score
                 
                 # Risk trends
-                risk_level = scan.get('risk_level', 'UNKNOWN')
-                risk_trends[scan_date][risk_level] += 1
+                risk_trends[scan_date][scan.get('risk_level', 'UNKNOWN')] += 1
                 
                 # Target counts
-                target = scan.get('target')
-                target_counts[target]['count'] += 1
-                target_counts[target]['total_score'] += scan.get('security_score', 0)
-                if not target_counts[target]['last_scan'] or scan['start_time'] > target_counts[target]['last_scan']:
-                    target_counts[target]['last_scan'] = scan['start_time']
+                target = target_counts[scan.get('target')]
+                target['count'] += 1
+                target['total_score'] += score
+                if not target['last_scan'] or start_time > target['last_scan']:
+                    target['last_scan'] = start_time
             
             # Format daily data
             formatted_daily = [
@@ -444,12 +761,13 @@ class JSONStorage:
             logger.error(f"Error getting trend data: {e}")
             return {}
     
-    def get_score_improvement_trend(self, target: str) -> Dict:
+    def get_score_improvement_trend(self, target: str, include_scans: bool = True) -> Dict:
         """
         Get security score improvement trend for a specific target
         
         Args:
             target: Target URL/IP
+            include_scans: Also return the per-scan score history
             
         Returns:
             Dict with score history
@@ -464,7 +782,7 @@ class JSONStorage:
                     'risk_level': s['risk_level']
                 }
                 for s in data['scans']
-                if s.get('target') == target
+                if s.get('target') == target and _is_completed(s)
             ]
             
             # Sort by start_time
@@ -481,20 +799,26 @@ class JSONStorage:
             else:
                 improvement = 0
             
-            return {
+            result = {
                 'target': target,
                 'total_scans': len(target_scans),
                 'first_score': target_scans[0]['security_score'],
                 'latest_score': target_scans[-1]['security_score'],
-                'improvement': round(improvement, 2),
-                'scans': target_scans
+                'improvement': round(improvement, 2)
             }
+            if include_scans:
+                result['scans'] = target_scans
+            return result
             
         except Exception as e:
             logger.error(f"Error getting score improvement: {e}")
             return {}
     
-    def close(self):
-        """Close connection (no-op for JSON storage)"""
+    def reconnect(self):
+        """Reopen connection (no-op for JSON storage)"""
         pass
+    
+    def close(self):
+        """Write any pending saves (there is no connection to close for JSON storage)"""
+        self.flush()
 
@@ -5,6 +5,7 @@ Orchestrates all security checks
 
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urlparse
 import validators
@@ -259,13 +260,15 @@ class SecurityScanner:
         }
         
         try:
-            # Quick SSL check
             ssl_checker = SSLChecker(self.parsed_url.hostname or self.original_target)
-            results['checks']['ssl'] = ssl_checker.quick_check()
-            
-            # Quick headers check
             header_analyzer = HeaderAnalyzer(self.normalized_target)
-            results['checks']['headers'] = header_analyzer.quick_analyze()
+            
+            # Run the SSL and headers checks side by side; both just wait on the network
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                ssl_future = executor.submit(ssl_checker.quick_check)
+                headers_future = executor.submit(header_analyzer.quick_analyze)
+                results['checks']['ssl'] = ssl_future.result()
+                results['checks']['headers'] = headers_future.result()
             
             # Calculate quick score
             results['quick_score'] = self._calculate_quick_score(results['checks'])
@@ -39,6 +39,11 @@ echo ""
 echo "Press Ctrl+C to stop the server"
 echo ""
 
-# Run the application
-python app.py
+# Run the application with gunicorn (threaded workers, see gunicorn.conf.py);
+# FLASK_DEBUG=true uses the Flask development server with auto-reload instead
+if [ "${FLASK_DEBUG,,}" = "true" ]; then
+    python app.py
+else
+    PORT="${PORT:-5000}" exec gunicorn -c gunicorn.conf.py app:app
+fi
 
@@ -99,18 +99,26 @@ async function handleScanSubmit(e) {
         
         const data = await response.json();
         
-        if (response.ok && data.status === 'success') {
+        if (response.status === 202 && data.status === 'queued') {
             currentScanId = data.scan_id;
-            displayResults(data.results);
             
-            // Always enable download button - payment modal will handle access
-            const downloadBtn = document.getElementById('downloadBtn');
-            if (downloadBtn) {
-                downloadBtn.disabled = false;
-                downloadBtn.style.opacity = '1';
-            }
+            // Scan runs in the background - wait for it to finish
+            const scan = await waitForScan(data.scan_id);
             
-            showAlert('Scan completed successfully! Click download to get your full report.', 'success');
+            if (scan.scan_status === 'completed') {
+                displayResults(scan.results);
+                
+                // Always enable download button - payment modal will handle access
+                const downloadBtn = document.getElementById('downloadBtn');
+                if (downloadBtn) {
+                    downloadBtn.disabled = false;
+                    downloadBtn.style.opacity = '1';
+                }
+                
+                showAlert('Scan completed successfully! Click download to get your full report.', 'success');
+            } else {
+                showAlert(scan.error || 'Scan failed. Please try again.', 'error');
+            }
         } else {
             showAlert(data.error || 'Scan failed. Please try again.', 'error');
         }
@@ -122,6 +130,29 @@ async function handleScanSubmit(e) {
     }
 }
 
+async function waitForScan(scanId) {
+    const maxAttempts = 200; // 10 minutes total (200 * 3 seconds)
+    
+    for (let attempts = 0; attempts < maxAttempts; attempts++) {
+        await new Promise(resolve => setTimeout(resolve, 3000));
+        
+        try {
+            const response = await fetch(`${API_BASE_URL}/api/scan/${scanId}/status`);
+            const data = await response.json();
+            
+            if (data.status === 'success' &&
+                (data.scan_status === 'completed' || data.scan_status === 'failed')) {
+                return data;
+            }
+        } catch (error) {
+            console.error('Scan status check error:', error);
+            // Don't stop polling on network errors, keep trying
+        }
+    }
+    
+    return { scan_status: 'failed', error: 'Scan timed out. Please try again later.' };
+}
+
 function showLoading(loading) {
     const button = document.getElementById('scanButton');
     const buttonText = document.getElementById('buttonText');
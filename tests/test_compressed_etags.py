@@ -0,0 +1,66 @@
+"""
+Conditional requests against compressed responses
+
+flask-compress rewrites the ETag of a compressed response to "<tag>:<algorithm>",
+and clients send that value back in If-None-Match.
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    # The app creates its storage, reports and log files relative to the working directory
+    workdir = tmp_path_factory.mktemp('app')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    try:
+        app_module = importlib.import_module('app')
+        # Enough scans for the admin listing to pass COMPRESS_MIN_SIZE
+        for number in range(10):
+            app_module.scan_storage.save_scan({
+                'scan_id': f'scan-{number}',
+                'target': f'https://example{number}.com',
+                'scan_type': 'full',
+                'security_score': 80,
+                'risk_level': 'LOW',
+                'start_time': '2024-01-01T00:00:00'
+            })
+        yield app_module.app.test_client()
+    finally:
+        sys.path.remove(ROOT)
+        os.chdir(cwd)
+
+
+@pytest.mark.parametrize('path', ['/', '/app.js'])
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_compressed_etag_revalidates(client, path, encoding):
+    response = client.get(path, headers={'Accept-Encoding': encoding})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == encoding
+    etag = response.headers['ETag']
+    assert etag.endswith(f':{encoding}"')
+
+    revalidated = client.get(path, headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+
+def test_admin_compressed_etag_revalidates(client):
+    with client.session_transaction() as admin_session:
+        admin_session['admin_logged_in'] = True
+
+    headers = {'Accept-Encoding': 'gzip'}
+    response = client.get('/api/admin/scans', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/api/admin/scans', headers={**headers, 'If-None-Match': etag})
+    assert revalidated.status_code == 304